@@ -1 +1,6 @@
-# Agents package for Salesforce AI Agent System 
\ No newline at end of file
+# Agents package for Salesforce AI Agent System
+#
+# perf-note: no numba, I/O bound. The agents are OpenAI and Salesforce round-trips
+# around JSON/string handling, with no numeric loops for JIT or vectorization to
+# speed up. Optimize via async/batching of the network calls. Each agent module
+# notes where its own time goes.
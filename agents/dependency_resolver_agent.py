@@ -1,3 +1,9 @@
+"""
+Dependency resolver agent - turns a technical design into ordered implementation tasks.
+
+perf-note: no numba, I/O bound. Each plan, sequence and story is one completion.
+"""
+
 import json
 from typing import Dict, Any, List
 from datetime import datetime
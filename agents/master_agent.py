@@ -1,5 +1,12 @@
+"""
+Requirement deconstructor agent - gathers and clarifies Salesforce requirements.
+
+perf-note: no numba, I/O bound. Each kickoff is a chat completion, so speed comes
+from fewer, smaller prompts and streaming rather than local compute.
+"""
+
 import json
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Callable
 from agents.simple_agent import Agent, Task, Crew
 import openai
 import os
@@ -17,14 +24,17 @@ class SalesforceRequirementDeconstructorAgent:
     into structured Salesforce implementation plans.
     """
     
-    def __init__(self, session_id: Optional[str] = None):
-        self.memory_manager = MemoryManager(session_id)
+    def __init__(self, session_id: Optional[str] = None, archive_overflow: bool = True):
+        self.memory_manager = MemoryManager(session_id, archive_overflow=archive_overflow)
         self.conversation_state = "initial"  # initial, clarifying, expert_analysis, suggestions_review, technical_design, task_creation, final_review, completed
         self.current_requirement = None
         self.expert_suggestions = None
         self.technical_design = None
         self.implementation_tasks = None
         
+        # Optional sink for streamed reply tokens, handed to every crew
+        self.token_callback: Optional[Callable[[str], None]] = None
+        
         # OpenAI is handled directly by the simple agent implementation
         
         # Initialize all specialized agents
@@ -126,7 +136,7 @@ class SalesforceRequirementDeconstructorAgent:
         )
         
         # Execute the task
-        crew = Crew(agents=[self.agent], tasks=[task])
+        crew = Crew(agents=[self.agent], tasks=[task], on_token=self.token_callback)
         result = crew.kickoff()
         
         # Determine next state based on response
@@ -172,7 +182,7 @@ class SalesforceRequirementDeconstructorAgent:
             agent=self.agent
         )
         
-        crew = Crew(agents=[self.agent], tasks=[task])
+        crew = Crew(agents=[self.agent], tasks=[task], on_token=self.token_callback)
         result = crew.kickoff()
         
         # Check if we're ready to move to expert analysis
@@ -266,7 +276,7 @@ class SalesforceRequirementDeconstructorAgent:
             agent=self.agent
         )
         
-        crew = Crew(agents=[self.agent], tasks=[task])
+        crew = Crew(agents=[self.agent], tasks=[task], on_token=self.token_callback)
         result = crew.kickoff()
         
         # Parse and structure the plan
@@ -310,7 +320,7 @@ class SalesforceRequirementDeconstructorAgent:
             agent=self.agent
         )
         
-        crew = Crew(agents=[self.agent], tasks=[task])
+        crew = Crew(agents=[self.agent], tasks=[task], on_token=self.token_callback)
         result = crew.kickoff()
         
         self.memory_manager.add_message("agent", str(result), "follow_up")
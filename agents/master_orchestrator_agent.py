@@ -2,11 +2,14 @@
 Master Orchestrator Agent - Single Point of User Interaction
 A hierarchical orchestrator that manages CrewAI multi-agent collaboration while
 maintaining a conversational interface with users.
+
+perf-note: no numba, I/O bound. The crews run sequential LLM tasks, so wall time
+is the sum of model round-trips.
 """
 
 import json
 import logging
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, List, Optional, Union, Callable
 from datetime import datetime
 from enum import Enum
 
@@ -16,7 +19,6 @@ from crewai.crew import CrewOutput
 
 # Local imports
 from .memory_manager import MemoryManager
-from salesforce_crew import SalesforceImplementationCrew, analyze_salesforce_requirement
 from .error_handler import error_handler, safe_execute
 
 logger = logging.getLogger(__name__)
@@ -46,15 +48,16 @@ class MasterOrchestratorAgent:
     The orchestration is hierarchical with this agent as the central coordinator.
     """
     
-    def __init__(self, session_id: Optional[str] = None):
+    def __init__(self, session_id: Optional[str] = None, archive_overflow: bool = True):
         """
         Initialize the Master Orchestrator Agent.
         
         Args:
             session_id: Unique session identifier for memory management
+            archive_overflow: Whether this agent's memory owns the session archive
         """
         self.session_id = session_id or f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        self.memory_manager = MemoryManager(self.session_id)
+        self.memory_manager = MemoryManager(self.session_id, archive_overflow=archive_overflow)
         self.conversation_state = ConversationState.INITIAL
         
         # Current session data
@@ -63,6 +66,9 @@ class MasterOrchestratorAgent:
         self.crew_result = None
         self.implementation_plan = None
         
+        # Optional hook handed to every crew; called after each agent step
+        self.step_callback: Optional[Callable[[Any], None]] = None
+        
         # Initialize the CrewAI system
         self.crew_system = None
         self._initialize_crew_system()
@@ -75,6 +81,8 @@ class MasterOrchestratorAgent:
     def _initialize_crew_system(self):
         """Initialize the CrewAI implementation crew."""
         try:
+            # Imported here so loading this module doesn't pull in the crew definitions
+            from salesforce_crew import SalesforceImplementationCrew
             self.crew_system = SalesforceImplementationCrew()
             logger.info("CrewAI system initialized successfully")
         except Exception as e:
@@ -200,7 +208,8 @@ class MasterOrchestratorAgent:
             agents=[self.orchestrator_agent],
             tasks=[analysis_task],
             process=Process.sequential,
-            verbose=False
+            verbose=False,
+            step_callback=self.step_callback
         )
         
         result = analysis_crew.kickoff()
@@ -258,7 +267,8 @@ class MasterOrchestratorAgent:
             agents=[self.orchestrator_agent],
             tasks=[clarification_task],
             process=Process.sequential,
-            verbose=False
+            verbose=False,
+            step_callback=self.step_callback
         )
         
         result = clarification_crew.kickoff()
@@ -309,6 +319,7 @@ This multi-agent collaboration will ensure we deliver a thorough, professional-g
         # Start the crew processing in the background (async-like behavior)
         try:
             # Use the existing CrewAI integration
+            from salesforce_crew import analyze_salesforce_requirement
             crew_result = analyze_salesforce_requirement(final_requirement)
             
             if crew_result.get('success'):
@@ -632,7 +643,8 @@ What specific modifications would you like to make to your Salesforce solution?"
             agents=[self.orchestrator_agent],
             tasks=[refinement_task],
             process=Process.sequential,
-            verbose=False
+            verbose=False,
+            step_callback=self.step_callback
         )
         
         result = refinement_crew.kickoff()
@@ -686,7 +698,8 @@ How would you like to proceed with these modifications?"""
             agents=[self.orchestrator_agent],
             tasks=[post_completion_task],
             process=Process.sequential,
-            verbose=False
+            verbose=False,
+            step_callback=self.step_callback
         )
         
         result = follow_up_crew.kickoff()
@@ -724,7 +737,8 @@ How would you like to proceed with these modifications?"""
             agents=[self.orchestrator_agent],
             tasks=[general_task],
             process=Process.sequential,
-            verbose=False
+            verbose=False,
+            step_callback=self.step_callback
         )
         
         result = general_crew.kickoff()
@@ -931,12 +945,13 @@ Would you like me to try processing your requirement again, or would you prefer
     
     def _get_conversation_context(self) -> str:
         """Get formatted conversation context."""
-        messages = self.memory_manager.get_conversation_history()
+        # Read the last messages directly rather than converting the whole history to dicts
+        messages = self.memory_manager.conversation_history[-10:]  # Last 10 messages
         context_parts = []
         
-        for msg in messages[-10:]:  # Last 10 messages
-            role = msg.get('role', 'unknown').title()
-            content = msg.get('content', '')
+        for msg in messages:
+            role = (msg.role or 'unknown').title()
+            content = msg.content or ''
             content = content[:200] + "..." if len(content) > 200 else content
             context_parts.append(f"{role}: {content}")
         
@@ -1,10 +1,22 @@
 import json
 import os
+import sys
+import threading
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 from config import Config
 
+# Several memory managers (and threads) can share a session id; one lock per
+# file keeps their writes from interleaving
+_FILE_LOCKS: Dict[str, threading.Lock] = {}
+_FILE_LOCKS_GUARD = threading.Lock()
+
+def _file_lock(file_path: str) -> threading.Lock:
+    """Get the process-wide lock guarding writes to a file."""
+    with _FILE_LOCKS_GUARD:
+        return _FILE_LOCKS.setdefault(file_path, threading.Lock())
+
 @dataclass
 class ConversationMessage:
     """Represents a single message in the conversation."""
@@ -27,11 +39,13 @@ class ConversationMessage:
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "ConversationMessage":
         """Create message from dictionary."""
+        # role/message_type come back from JSON as fresh strings; interning them
+        # shares one copy per value and keeps type comparisons identity-fast
         return cls(
             timestamp=data["timestamp"],
-            role=data["role"],
+            role=sys.intern(data["role"]),
             content=data["content"],
-            message_type=data.get("message_type", "text"),
+            message_type=sys.intern(data.get("message_type", "text")),
             metadata=data.get("metadata", {})
         )
 
@@ -40,9 +54,23 @@ class MemoryManager:
     
     MAX_HISTORY_SIZE = 100  # Prevent memory leaks
     MAX_FILE_SIZE_MB = 10   # Maximum file size in MB
+    CONTEXT_FULL_MESSAGES = 4   # Newest messages passed to prompts verbatim
+    CONTEXT_CLIP_CHARS = 500    # Older verbose agent output is clipped to this many characters
+    # Long agent/expert outputs that may be clipped once older; user turns never are
+    CONTEXT_CLIP_TYPES = frozenset({
+        "expert_suggestions", "schema_analysis", "suggestion_details", "crew_results_presented",
+        "plan_details", "technical_design_complete", "task_creation_complete", "tasks_explained"
+    })
     
-    def __init__(self, session_id: Optional[str] = None):
+    def __init__(self, session_id: Optional[str] = None, archive_overflow: bool = True):
+        """
+        Args:
+            session_id: Session to load or create
+            archive_overflow: Append trimmed messages to the session archive; only
+                one manager per session should own the archive
+        """
         self.session_id = session_id or self._generate_session_id()
+        self.archive_overflow = archive_overflow
         self.conversation_history: List[ConversationMessage] = []
         self.requirements_extracted: List[Dict[str, Any]] = []
         self.implementation_plan: Optional[Dict[str, Any]] = None
@@ -63,6 +91,10 @@ class MemoryManager:
         """Get the file path for conversation history."""
         return os.path.join(Config.CONVERSATION_HISTORY_PATH, f"{self.session_id}.json")
     
+    def _get_archive_file_path(self) -> str:
+        """Get the file path for messages rotated out of the in-memory history."""
+        return os.path.join(Config.CONVERSATION_HISTORY_PATH, f"{self.session_id}.archive.jsonl")
+    
     def _get_plan_file_path(self) -> str:
         """Get the file path for implementation plan."""
         return os.path.join(Config.PLANS_STORAGE_PATH, f"{self.session_id}_plan.json")
@@ -85,8 +117,11 @@ class MemoryManager:
         """Add a new message to the conversation history with memory management."""
         # Prevent memory leaks by limiting history size
         if len(self.conversation_history) >= self.MAX_HISTORY_SIZE:
-            # Keep only the most recent messages
-            self.conversation_history = self.conversation_history[-(self.MAX_HISTORY_SIZE // 2):]
+            # Keep only the most recent messages; older ones are archived, not lost
+            keep = self.MAX_HISTORY_SIZE // 2
+            if self.archive_overflow:
+                self._archive_messages(self.conversation_history[:-keep])
+            self.conversation_history = self.conversation_history[-keep:]
             self._memory_usage = len(self.conversation_history)
         
         message = ConversationMessage(
@@ -101,11 +136,22 @@ class MemoryManager:
         self._save_conversation()
     
     def get_conversation_context(self, max_messages: int = 20) -> str:
-        """Get recent conversation context as a formatted string."""
+        """
+        Get recent conversation context as a formatted string.
+        The newest messages are kept verbatim; older verbose agent output (expert
+        analyses, designs, task lists) is clipped so it doesn't crowd out the rest
+        of the prompt. User messages and requirements are always passed in full.
+        """
         recent_messages = self.conversation_history[-max_messages:]
+        full_from = len(recent_messages) - self.CONTEXT_FULL_MESSAGES
         context = []
-        for msg in recent_messages:
-            context.append(f"[{msg.role.upper()}]: {msg.content}")
+        for i, msg in enumerate(recent_messages):
+            content = msg.content
+            if (i < full_from and msg.role != "user"
+                    and msg.message_type in self.CONTEXT_CLIP_TYPES
+                    and len(content) > self.CONTEXT_CLIP_CHARS):
+                content = content[:self.CONTEXT_CLIP_CHARS] + "... [truncated]"
+            context.append(f"[{msg.role.upper()}]: {content}")
         return "\n".join(context)
     
     def get_requirements_summary(self) -> str:
@@ -154,11 +200,39 @@ class MemoryManager:
         }
         
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(conversation_data, f, indent=2, ensure_ascii=False)
+            # Rewritten on every message, so kept compact rather than pretty-printed;
+            # written to a temp file and swapped in so readers never see a partial file
+            with _file_lock(file_path):
+                tmp_path = f"{file_path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(conversation_data, f, separators=(',', ':'), ensure_ascii=False)
+                os.replace(tmp_path, file_path)
         except Exception as e:
             print(f"Error saving conversation: {e}")
     
+    def _archive_messages(self, messages: List[ConversationMessage]):
+        """Append messages to the session archive (one JSON object per line)."""
+        if not messages:
+            return
+        try:
+            file_path = self._get_archive_file_path()
+            with _file_lock(file_path), open(file_path, 'a', encoding='utf-8') as f:
+                f.writelines(json.dumps(msg.to_dict(), ensure_ascii=False) + "\n" for msg in messages)
+        except Exception as e:
+            print(f"Error archiving conversation: {e}")
+    
+    def get_archived_messages(self) -> List[Dict[str, Any]]:
+        """Read messages rotated out of the in-memory history; only touches disk when called."""
+        file_path = self._get_archive_file_path()
+        if not os.path.exists(file_path):
+            return []
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except Exception as e:
+            print(f"Error loading conversation archive: {e}")
+            return []
+    
     def get_all_sessions(self) -> List[str]:
         """Get list of all available conversation sessions."""
         sessions = []
@@ -1,3 +1,10 @@
+"""
+Salesforce schema expert agent - analyzes requirements against the org's schema.
+
+perf-note: no numba, I/O bound. Time goes to completions and Salesforce describe
+calls, so fetch only the objects a requirement mentions.
+"""
+
 from typing import Dict, Any, List, Optional
 from agents.simple_agent import Agent, Task, Crew
 import openai
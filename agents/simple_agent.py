@@ -1,10 +1,12 @@
 """
 Simple agent implementation to replace CrewAI for better deployment compatibility.
 Uses OpenAI directly without heavyweight dependencies.
+
+perf-note: no numba, I/O bound. Latency is the OpenAI round-trip.
 """
 
 import openai
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Callable
 import os
 import time
 
@@ -26,8 +28,9 @@ class SimpleAgent:
             openai.api_key = os.getenv("OPENAI_API_KEY")
             self.use_new_api = False
     
-    def execute_task(self, task_description: str, context: str = "") -> str:
-        """Execute a task using OpenAI."""
+    def execute_task(self, task_description: str, context: str = "",
+                     on_token: Optional[Callable[[str], None]] = None) -> str:
+        """Execute a task using OpenAI; with on_token the reply is streamed to it as it arrives."""
         
         system_prompt = f"""
         You are a {self.role}.
@@ -48,7 +51,26 @@ class SimpleAgent:
         """
         
         try:
-            if self.use_new_api:
+            if self.use_new_api and on_token:
+                # New OpenAI API (1.0+), streamed
+                stream = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    temperature=0.7,
+                    max_tokens=2000,
+                    stream=True
+                )
+                parts = []
+                for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        parts.append(delta)
+                        on_token(delta)
+                return "".join(parts)
+            elif self.use_new_api:
                 # New OpenAI API (1.0+)
                 response = self.client.chat.completions.create(
                     model=self.model,
@@ -84,16 +106,17 @@ class SimpleTask:
         self.expected_output = expected_output
         self.agent = agent
     
-    def execute(self, context: str = "") -> str:
+    def execute(self, context: str = "", on_token: Optional[Callable[[str], None]] = None) -> str:
         """Execute the task."""
-        return self.agent.execute_task(self.description, context)
+        return self.agent.execute_task(self.description, context, on_token=on_token)
 
 class SimpleCrew:
     """A simple crew implementation."""
     
-    def __init__(self, agents: list, tasks: list):
+    def __init__(self, agents: list, tasks: list, on_token: Optional[Callable[[str], None]] = None):
         self.agents = agents
         self.tasks = tasks
+        self.on_token = on_token
     
     def kickoff(self) -> str:
         """Execute all tasks and return the final result."""
@@ -101,7 +124,7 @@ class SimpleCrew:
         context = ""
         
         for task in self.tasks:
-            result = task.execute(context)
+            result = task.execute(context, on_token=self.on_token)
             results.append(result)
             context += f"\n\nPrevious task result: {result}"
         
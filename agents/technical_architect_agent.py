@@ -1,3 +1,9 @@
+"""
+Technical architect agent - produces the technical design for Salesforce solutions.
+
+perf-note: no numba, I/O bound. Design and validation are each one completion.
+"""
+
 import json
 from typing import Dict, Any, List
 from datetime import datetime
@@ -1,11 +1,17 @@
 """
 Unified Agent System - Resolves conflicts between CrewAI and Legacy agent systems.
 Provides a single interface for agent operations with proper error handling and memory management.
+
+perf-note: no numba, I/O bound. This layer only routes to a sub-system, and
+persistence is queued to a writer thread so disk I/O stays off the request path.
 """
 
 import json
 import logging
-from typing import Dict, Any, List, Optional, Union
+import queue
+import threading
+import weakref
+from typing import Dict, Any, List, Optional, Union, Callable
 from datetime import datetime
 from enum import Enum
 
@@ -26,6 +32,28 @@ from .master_orchestrator_agent import MasterOrchestratorAgent
 
 logger = logging.getLogger(__name__)
 
+# Queue sentinel that tells the memory writer thread to exit
+_STOP_WRITER = None
+
+def _drain_memory_queue(mem_q: queue.Queue, memory_manager: MemoryManager):
+    """Background consumer that writes queued messages to the memory manager."""
+    while True:
+        item = mem_q.get()
+        try:
+            if item is _STOP_WRITER:
+                return
+            role, content, message_type = item
+            memory_manager.add_message(role, content, message_type)
+        except Exception as e:
+            logger.error(f"Failed to persist queued message: {e}")
+        finally:
+            mem_q.task_done()
+
+def _stop_memory_writer(mem_q: queue.Queue, writer: threading.Thread):
+    """Let the writer finish the queued messages, then stop it."""
+    mem_q.put(_STOP_WRITER)
+    writer.join()
+
 class AgentSystemType(Enum):
     """Available agent system types."""
     ORCHESTRATOR = "orchestrator"  # New hierarchical master orchestrator (recommended)
@@ -53,6 +81,17 @@ class UnifiedAgentSystem:
         self.active_system = None
         self.conversation_state = "initial"
         
+        # Persist messages off the request path; a single consumer keeps ordering.
+        # The writer holds only the queue and memory manager, not self, so an
+        # abandoned system can be collected; the finalizer stops and drains it
+        # on close(), on garbage collection, or at interpreter exit.
+        self._mem_q = queue.Queue()
+        self._mem_writer = threading.Thread(
+            target=_drain_memory_queue, args=(self._mem_q, self.memory_manager), daemon=True
+        )
+        self._mem_writer.start()
+        self._close_writer = weakref.finalize(self, _stop_memory_writer, self._mem_q, self._mem_writer)
+        
         # Initialize systems
         self._initialize_systems()
         
@@ -78,7 +117,9 @@ class UnifiedAgentSystem:
         # Initialize Legacy system (old master agent)
         try:
             from .master_agent import SalesforceRequirementDeconstructorAgent
-            self.legacy_system = SalesforceRequirementDeconstructorAgent(self.session_id)
+            # The unified memory owns the session archive; sub-systems sharing the
+            # session id must not append the same turns to it again
+            self.legacy_system = SalesforceRequirementDeconstructorAgent(self.session_id, archive_overflow=False)
             logger.info("Legacy system initialized successfully")
         except Exception as e:
             logger.warning(f"Failed to initialize Legacy system: {e}")
@@ -86,7 +127,7 @@ class UnifiedAgentSystem:
         
         # Initialize Master Orchestrator (new hierarchical system)
         try:
-            self.orchestrator_system = MasterOrchestratorAgent(self.session_id)
+            self.orchestrator_system = MasterOrchestratorAgent(self.session_id, archive_overflow=False)
             logger.info("Master Orchestrator system initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize Master Orchestrator system: {e}")
@@ -122,12 +163,31 @@ class UnifiedAgentSystem:
             else:
                 raise RuntimeError("No agent systems available")
     
-    def process_user_input(self, user_input: str) -> Dict[str, Any]:
+    def _record_message(self, role: str, content: str, message_type: str):
+        """Queue a message for persistence without blocking the caller."""
+        if not self._close_writer.alive:
+            # Closed: nothing drains the queue any more, so write through
+            self.memory_manager.add_message(role, content, message_type)
+            return
+        self._mem_q.put_nowait((role, content, message_type))
+    
+    def flush_memory(self):
+        """Block until all queued messages have been persisted."""
+        self._mem_q.join()
+    
+    def close(self):
+        """Persist any queued messages and stop the background writer thread."""
+        self._close_writer()
+    
+    def process_user_input(self, user_input: str,
+                           stream_callback: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
         """
         Process user input using the active agent system with error recovery.
         
         Args:
             user_input: User's requirement or question
+            stream_callback: Optional callable that receives intermediate agent
+                output as text while the request is being processed
             
         Returns:
             Dictionary containing response and metadata
@@ -140,23 +200,29 @@ class UnifiedAgentSystem:
             }
         
         # Store user input in memory
-        self.memory_manager.add_message("user", user_input, "requirement")
+        self._record_message("user", user_input, "requirement")
         
         try:
             if self.active_system == AgentSystemType.ORCHESTRATOR:
-                return self._process_with_orchestrator(user_input)
+                return self._process_with_orchestrator(user_input, stream_callback)
             elif self.active_system == AgentSystemType.CREWAI:
                 return self._process_with_crewai(user_input)
             else:
-                return self._process_with_legacy(user_input)
+                return self._process_with_legacy(user_input, stream_callback)
         except Exception as e:
             logger.error(f"Error in {self.active_system.value} system: {e}")
             return self._handle_system_error(e, user_input)
     
-    def _process_with_orchestrator(self, user_input: str) -> Dict[str, Any]:
+    def _process_with_orchestrator(self, user_input: str,
+                                   stream_callback: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
         """Process input using Master Orchestrator system."""
         try:
-            result = self.orchestrator_system.process_user_input(user_input)
+            # Forward each crew step to the caller while this request runs
+            self.orchestrator_system.step_callback = self._make_step_callback(stream_callback)
+            try:
+                result = self.orchestrator_system.process_user_input(user_input)
+            finally:
+                self.orchestrator_system.step_callback = None
             
             # The orchestrator returns a structured response
             return {
@@ -174,6 +240,25 @@ class UnifiedAgentSystem:
             logger.error(f"Orchestrator system error: {e}")
             raise
     
+    @staticmethod
+    def _make_step_callback(stream_callback: Optional[Callable[[str], None]]):
+        """Wrap a text callback as a CrewAI step callback."""
+        if stream_callback is None:
+            return None
+        
+        def on_step(step):
+            # Agent steps expose their reasoning as 'thought'; finished steps as 'output'
+            text = getattr(step, 'thought', None) or getattr(step, 'output', None) or getattr(step, 'log', None)
+            if not text:
+                return
+            try:
+                stream_callback(f"{str(text).strip()}\n\n")
+            except Exception as e:
+                # A failing display hook must never break the crew run
+                logger.debug(f"Stream callback failed: {e}")
+        
+        return on_step
+    
     def _process_with_crewai(self, user_input: str) -> Dict[str, Any]:
         """Process input using CrewAI system."""
         try:
@@ -190,7 +275,7 @@ class UnifiedAgentSystem:
             # Store response in memory
             if result.get('success'):
                 response_content = self._format_crewai_response(result)
-                self.memory_manager.add_message("agent", response_content, "crewai_response")
+                self._record_message("agent", response_content, "crewai_response")
                 
                 return {
                     "success": True,
@@ -206,17 +291,23 @@ class UnifiedAgentSystem:
             logger.error(f"CrewAI processing error: {e}")
             raise
     
-    def _process_with_legacy(self, user_input: str) -> Dict[str, Any]:
+    def _process_with_legacy(self, user_input: str,
+                             stream_callback: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
         """Process input using Legacy system."""
         try:
-            result = self.legacy_system.process_user_input(user_input)
+            # The legacy agents stream reply tokens straight to the caller
+            self.legacy_system.token_callback = stream_callback
+            try:
+                result = self.legacy_system.process_user_input(user_input)
+            finally:
+                self.legacy_system.token_callback = None
             
             # Update conversation state
             self.conversation_state = self.legacy_system.conversation_state
             
             # Store response in memory if not already stored by legacy system
             if result.get('response') and not result.get('stored_in_memory'):
-                self.memory_manager.add_message("agent", result['response'], result.get('type', 'legacy_response'))
+                self._record_message("agent", result['response'], result.get('type', 'legacy_response'))
             
             result['system'] = 'legacy'
             result['conversation_state'] = self.conversation_state
@@ -249,7 +340,7 @@ class UnifiedAgentSystem:
         
         # If no fallback available or fallback failed, return error
         error_message = f"Agent system error: {str(error)}"
-        self.memory_manager.add_message("agent", error_message, "system_error")
+        self._record_message("agent", error_message, "system_error")
         
         return {
             "success": False,
@@ -307,6 +398,7 @@ class UnifiedAgentSystem:
     
     def get_conversation_history(self) -> List[Dict[str, Any]]:
         """Get the conversation history."""
+        self.flush_memory()
         return self.memory_manager.get_conversation_history()
     
     def get_session_id(self) -> str:
@@ -352,6 +444,7 @@ class UnifiedAgentSystem:
     
     def clear_memory(self):
         """Clear conversation memory."""
+        self.flush_memory()
         self.memory_manager.clear_conversation_history()
         self.conversation_state = "initial"
         if self.legacy_system:
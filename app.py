@@ -2,15 +2,24 @@ import streamlit as st
 import time
 from typing import Dict, Any, Optional, Union, List
 import json
+import html
+import re
+from collections import deque
 from datetime import datetime
 import logging
+import threading
+import openai
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from functools import lru_cache
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 from config import Config
 # Import unified agent system
 from agents.unified_agent_system import UnifiedAgentSystem, AgentSystemType
-from agents.error_handler import error_handler, format_error_for_ui, safe_execute
-# Import CrewAI implementation (fallback)
-from salesforce_crew import CrewExecutor, analyze_salesforce_requirement, is_complex_requirement
+from agents.error_handler import error_handler, format_error_for_ui, safe_execute, AuthenticationError
 
 # Safe import of CrewOutput
 try:
@@ -18,6 +27,32 @@ try:
 except ImportError:
     CrewOutput = None
 
+# Refresh interval (seconds) for live agent activity while processing
+ACTIVITY_REFRESH_SECONDS = 1.0
+
+# Poll interval (seconds) while waiting on a background agent reply
+REPLY_POLL_SECONDS = 0.5
+
+# Minimum interval (seconds) between UI flushes of streamed agent output (<=10 Hz)
+STREAM_FLUSH_SECONDS = 0.1
+
+# Number of most recent messages rendered by default (and per "Load older" page)
+CONVERSATION_WINDOW_SIZE = 40
+# Upper bound on completed agent activities kept for the activity panel
+COMPLETED_ACTIVITY_LIMIT = 50
+# Lifetime (seconds) of a cached Salesforce token when the OAuth response has no
+# expires_in; kept under Salesforce's shortest session timeout (15 minutes)
+SF_TOKEN_FALLBACK_TTL_SECONDS = 600
+# Number of section timings kept for the debug profiler
+PROFILE_HISTORY_SIZE = 200
+
+# Placeholder shown until the first message is sent
+_WELCOME_HTML = (
+    '<div style="text-align: center; color: #666; margin: 50px 0;">'
+    '💬 Start a conversation by describing your Salesforce requirement'
+    '</div>'
+)
+
 # Configure Streamlit page
 st.set_page_config(
     page_title=Config.APP_NAME,
@@ -38,7 +73,10 @@ st.set_page_config(
 )
 
 # Consolidated CSS for better UI consistency
-st.markdown("""
+@st.cache_resource
+def _css() -> str:
+    """Return the app-wide stylesheet, built once per server process."""
+    return """
 <style>
     /* Main Layout */
     .main .block-container {
@@ -314,384 +352,581 @@ st.markdown("""
         border-radius: 8px;
         margin: 8px 0;
     }
+    
+    /* Simple chat layout (overrides the main layout above) */
+    .main .block-container {
+        padding-top: 1rem !important;
+        max-width: 800px !important;
+        padding-bottom: 100px !important;
+    }
+    
+    /* Space between the chat history and the input form */
+    .main [data-testid="stForm"] {
+        margin-top: 100px;
+    }
+    
+    .chat-input-container {
+        position: fixed;
+        bottom: 0;
+        left: 0;
+        right: 0;
+        background: white;
+        padding: 20px;
+        border-top: 1px solid #ddd;
+        z-index: 1000;
+    }
+    
+    /* Sidebar agent status indicators */
+    .agent-indicator {
+        display: flex;
+        align-items: center;
+        padding: 8px 12px;
+        margin: 4px 0;
+        border-radius: 20px;
+        font-size: 0.85rem;
+        font-weight: 500;
+        transition: all 0.3s ease;
+        border: 2px solid transparent;
+    }
+    
+    .agent-indicator.active {
+        background: linear-gradient(135deg, #28a745 0%, #20c997 100%);
+        color: white;
+        border-color: #1e7e34;
+        box-shadow: 0 2px 8px rgba(40, 167, 69, 0.3);
+        animation: pulse-green 2s infinite;
+    }
+    
+    .agent-indicator.inactive {
+        background: #f8f9fa;
+        color: #6c757d;
+        border-color: #dee2e6;
+    }
+    
+    .agent-indicator.pending {
+        background: linear-gradient(135deg, #ffc107 0%, #fd7e14 100%);
+        color: #212529;
+        border-color: #e0a800;
+        box-shadow: 0 2px 8px rgba(255, 193, 7, 0.3);
+    }
+    
+    .agent-icon {
+        margin-right: 8px;
+        font-size: 1rem;
+    }
+    
+    @keyframes pulse-green {
+        0%, 100% { transform: scale(1); }
+        50% { transform: scale(1.02); }
+    }
+    
+    .agent-status-container {
+        margin: 10px 0;
+    }
 </style>
-""", unsafe_allow_html=True)
+"""
 
-def initialize_session_state():
-    """Initialize Streamlit session state variables."""
+# Session state defaults, applied once per key; callables build a fresh value per session
+_SESSION_DEFAULTS = {
     # Unified Agent System
-    if 'unified_agent' not in st.session_state:
-        st.session_state.unified_agent = None
-    if 'conversation_history' not in st.session_state:
-        st.session_state.conversation_history = []
-    if 'current_session_id' not in st.session_state:
-        st.session_state.current_session_id = None
-    if 'processing' not in st.session_state:
-        st.session_state.processing = False
-    
-    # Agent system preference
-    # Always use Master Orchestrator - no user selection needed
-    st.session_state.preferred_agent_system = AgentSystemType.ORCHESTRATOR
-    if 'crew_interactive_mode' not in st.session_state:
-        st.session_state.crew_interactive_mode = 'auto'  # auto, always, never
+    'unified_agent': None,
+    'conversation_history': list,
+    'current_session_id': None,
+    'processing': False,
+    'crew_interactive_mode': 'auto',  # auto, always, never
     
     # Configuration state
-    if 'config_complete' not in st.session_state:
-        st.session_state.config_complete = False
-    if 'openai_api_key' not in st.session_state:
-        st.session_state.openai_api_key = ""
-    if 'sf_instance_url' not in st.session_state:
-        st.session_state.sf_instance_url = ""
-    if 'sf_client_id' not in st.session_state:
-        st.session_state.sf_client_id = ""
-    if 'sf_client_secret' not in st.session_state:
-        st.session_state.sf_client_secret = ""
-    if 'sf_domain' not in st.session_state:
-        st.session_state.sf_domain = "login"
-    if 'sf_username' not in st.session_state:
-        st.session_state.sf_username = ""
-    if 'sf_password' not in st.session_state:
-        st.session_state.sf_password = ""
-    if 'sf_security_token' not in st.session_state:
-        st.session_state.sf_security_token = ""
-    if 'auth_method_selected' not in st.session_state:
-        st.session_state.auth_method_selected = False
-    if 'use_username_password' not in st.session_state:
-        st.session_state.use_username_password = False
-    if 'last_auth_method' not in st.session_state:
-        st.session_state.last_auth_method = ""
-    if 'force_ui_config' not in st.session_state:
-        st.session_state.force_ui_config = False
+    'config_complete': False,
+    'openai_api_key': "",
+    'sf_instance_url': "",
+    'sf_client_id': "",
+    'sf_client_secret': "",
+    'sf_domain': "login",
+    'sf_username': "",
+    'sf_password': "",
+    'sf_security_token': "",
+    'auth_method_selected': False,
+    'use_username_password': False,
+    'last_auth_method': "",
+    'force_ui_config': False,
     
     # Error tracking
-    if 'error_history' not in st.session_state:
-        st.session_state.error_history = []
+    'error_history': list,
+    
+    # Legacy compatibility - initialize agent as None for old code compatibility
+    'agent': None,
+    
+    # Pending next phase for automatic progression
+    'pending_next_phase': None,
+    
+    # Future for the agent call currently running in the background
+    'pending_reply': None,
+    'pending_message': None,
+    'stream_buffer': None,
+    
+    # Number of most recent messages currently rendered in the chat
+    'history_window': CONVERSATION_WINDOW_SIZE,
+}
+
+def initialize_session_state():
+    """Initialize Streamlit session state variables."""
+    session_state = st.session_state
+    for key, default in _SESSION_DEFAULTS.items():
+        if key not in session_state:
+            session_state[key] = default() if callable(default) else default
+    
+    # Agent system preference
+    # Always use Master Orchestrator - no user selection needed
+    session_state.preferred_agent_system = AgentSystemType.ORCHESTRATOR
     
     # Legacy compatibility - Master Orchestrator uses modern CrewAI flow
-    st.session_state.use_crewai = True  # Always true since we're using Master Orchestrator
+    session_state.use_crewai = True  # Always true since we're using Master Orchestrator
     
-    # Legacy compatibility - initialize agent as None for old code compatibility
-    if 'agent' not in st.session_state:
-        st.session_state.agent = None
-        
     # Initialize unified agent if configuration is complete
-    if st.session_state.config_complete and not st.session_state.unified_agent:
+    if session_state.config_complete and not session_state.unified_agent:
         try:
-            st.session_state.unified_agent = UnifiedAgentSystem(
-                preferred_system=st.session_state.preferred_agent_system
+            session_state.unified_agent = UnifiedAgentSystem(
+                preferred_system=session_state.preferred_agent_system
             )
-            st.session_state.conversation_history = st.session_state.unified_agent.get_conversation_history()
+            session_state.conversation_history = session_state.unified_agent.get_conversation_history()
         except Exception as e:
             error_response = error_handler.handle_error(e, "Agent initialization")
             formatted_error = format_error_for_ui(error_response)
             st.error(f"{formatted_error['title']}: {formatted_error['message']}")
-            st.session_state.unified_agent = None
+            session_state.unified_agent = None
     
     # Initialize agent activity tracking
     initialize_agent_tracking()
-    
-    # Initialize pending next phase for automatic progression
-    if 'pending_next_phase' not in st.session_state:
-        st.session_state.pending_next_phase = None
+
+# Conversation state -> (badge label, badge CSS class)
+_STATE_MAPPING = {
+    "initial": ("Initial", "status-initial"),
+    "clarifying": ("Clarifying Requirements", "status-clarifying"),
+    "expert_analysis": ("Expert Analysis", "status-expert"),
+    "suggestions_review": ("Reviewing Suggestions", "status-suggestions"),
+    "technical_design": ("Technical Architecture", "status-planning"),
+    "task_creation": ("Creating Implementation Tasks", "status-planning"),
+    "final_review": ("Final Review", "status-suggestions"),
+    "planning": ("Ready for Planning", "status-planning"),
+    "completed": ("Implementation Plan Created", "status-completed")
+}
+
+# Conversation state -> sidebar progress bar value
+_PROGRESS_MAPPING = {
+    "initial": 0.10,
+    "clarifying": 0.25,
+    "expert_analysis": 0.40,
+    "suggestions_review": 0.55,
+    "technical_design": 0.70,
+    "task_creation": 0.85,
+    "final_review": 0.95,
+    "planning": 0.90,
+    "completed": 1.0
+}
+
+# Badge HTML is static per state, so build it once at import time
+_BADGE_HTML = {
+    state: f'<span class="status-badge {css_class}">{label}</span>'
+    for state, (label, css_class) in _STATE_MAPPING.items()
+}
+_UNKNOWN_BADGE_HTML = '<span class="status-badge status-initial">Unknown</span>'
 
 def get_status_badge(state: str) -> str:
     """Get HTML for status badge based on conversation state."""
-    state_mapping = {
-        "initial": ("Initial", "status-initial"),
-        "clarifying": ("Clarifying Requirements", "status-clarifying"),
-        "expert_analysis": ("Expert Analysis", "status-expert"),
-        "suggestions_review": ("Reviewing Suggestions", "status-suggestions"),
-        "technical_design": ("Technical Architecture", "status-planning"),
-        "task_creation": ("Creating Implementation Tasks", "status-planning"),
-        "final_review": ("Final Review", "status-suggestions"),
-        "planning": ("Ready for Planning", "status-planning"),
-        "completed": ("Implementation Plan Created", "status-completed")
-    }
-    
-    label, css_class = state_mapping.get(state, ("Unknown", "status-initial"))
-    return f'<span class="status-badge {css_class}">{label}</span>'
+    return _BADGE_HTML.get(state, _UNKNOWN_BADGE_HTML)
 
 def initialize_agent_tracking():
     """Initialize agent activity tracking."""
-    if 'agent_activities' not in st.session_state:
-        st.session_state.agent_activities = []
+    # Active records are indexed by agent name; completed ones are kept in
+    # completion order so expired entries can be dropped from the left
+    if 'active_activities' not in st.session_state:
+        st.session_state.active_activities = {}
+    if 'completed_activities' not in st.session_state:
+        st.session_state.completed_activities = deque(maxlen=COMPLETED_ACTIVITY_LIMIT)
     if 'current_agent_start_time' not in st.session_state:
         st.session_state.current_agent_start_time = None
 
 def add_agent_activity(agent_name: str, activity: str, start_time = None):
-    """Add or update agent activity tracking."""
-    import time
-    
-    if 'agent_activities' not in st.session_state:
-        st.session_state.agent_activities = []
+    """Add or update agent activity tracking (start_time is a time.monotonic() value)."""
+    initialize_agent_tracking()
     
-    current_time = start_time or time.time()
+    current_time = start_time or time.monotonic()
     
-    # Check if this agent is already in the list (update existing)
-    for activity_record in st.session_state.agent_activities:
-        if activity_record['agent'] == agent_name and activity_record['status'] == 'active':
-            activity_record['activity'] = activity
-            activity_record['last_update'] = current_time
-            return
+    # Check if this agent is already active (update existing)
+    activity_record = st.session_state.active_activities.get(agent_name)
+    if activity_record:
+        activity_record['activity'] = activity
+        activity_record['last_update'] = current_time
+        return
     
     # Add new agent activity
-    st.session_state.agent_activities.append({
+    st.session_state.active_activities[agent_name] = {
         'agent': agent_name,
         'activity': activity,
         'start_time': current_time,
         'last_update': current_time,
         'status': 'active'  # active, completed
-    })
+    }
 
 def complete_agent_activity(agent_name: str):
     """Mark agent activity as completed and calculate duration."""
-    import time
-    
-    if 'agent_activities' not in st.session_state:
+    if 'active_activities' not in st.session_state:
         return
     
-    for activity_record in st.session_state.agent_activities:
-        if activity_record['agent'] == agent_name and activity_record['status'] == 'active':
-            duration = time.time() - activity_record['start_time']
-            activity_record['status'] = 'completed'
-            activity_record['duration'] = duration
-            activity_record['completion_time'] = time.time()
-            break
+    current_time = time.monotonic()
+    activity_record = st.session_state.active_activities.pop(agent_name, None)
+    if activity_record:
+        activity_record['status'] = 'completed'
+        activity_record['duration'] = current_time - activity_record['start_time']
+        activity_record['completion_time'] = current_time
+        st.session_state.completed_activities.append(activity_record)
     
     # Clean up old completed activities (older than 30 seconds)
-    current_time = time.time()
-    st.session_state.agent_activities = [
-        activity for activity in st.session_state.agent_activities
-        if activity['status'] == 'active' or 
-           (activity['status'] == 'completed' and 
-            current_time - activity.get('completion_time', 0) < 30)
-    ]
+    completed = st.session_state.completed_activities
+    while completed and current_time - completed[0]['completion_time'] >= 30:
+        completed.popleft()
+
+def complete_all_agent_activities() -> int:
+    """Mark every active agent activity as completed in one pass; returns how many were closed."""
+    active = st.session_state.get('active_activities')
+    if not active:
+        return 0
+    
+    current_time = time.monotonic()
+    for activity_record in active.values():
+        activity_record['status'] = 'completed'
+        activity_record['duration'] = current_time - activity_record['start_time']
+        activity_record['completion_time'] = current_time
+    
+    count = len(active)
+    st.session_state.completed_activities.extend(active.values())
+    active.clear()
+    return count
+
+def get_recent_agent_activities(limit: int = 3) -> List[Dict[str, Any]]:
+    """Get the most recent activity records, completed ones first."""
+    if 'active_activities' not in st.session_state:
+        return []
+    records = [*st.session_state.completed_activities, *st.session_state.active_activities.values()]
+    return records[-limit:]
+
+# Conversation state (orchestrator and legacy) -> label shown while a reply is pending
+_AGENT_STATUS_LABELS = {
+    "initial": "🤖 **Master Agent** is analyzing your requirements...",
+    "clarifying": "🤖 **Master Agent** is analyzing your requirements...",
+    "requirements_validated": "✅ **Master Agent** validated your requirements and is briefing the expert team...",
+    "crew_processing": "🗄️ **Expert Team** (Schema, Architecture, Dependencies) is designing your solution...",
+    "plan_review": "📋 **Master Agent** is preparing the implementation plan for your review...",
+    "plan_refinement": "🔧 **Expert Team** is refining the plan with your feedback...",
+    "completed": "✨ **Master Agent** is answering your follow-up...",
+    "expert_analysis": "🎯 **Expert Agent** is identifying gaps and enhancements...",
+    "suggestions_review": "🤝 **Master Agent** is presenting expert recommendations...",
+    "planning": "📋 **Master Agent** is creating your implementation plan..."
+}
+_DEFAULT_AGENT_STATUS_LABEL = "🤖 **Master Agent** is processing your request..."
 
 def get_agent_status_display() -> str:
     """Get current agent status for display."""
-    if not st.session_state.unified_agent:
+    unified_agent = st.session_state.unified_agent
+    if not unified_agent:
         return ""
     
     # Try to get state from unified agent system
     try:
-        if hasattr(st.session_state.unified_agent, 'get_system_status'):
-            status = st.session_state.unified_agent.get_system_status()
+        if hasattr(unified_agent, 'get_system_status'):
+            status = unified_agent.get_system_status()
             agent_state = status.get('conversation_state', 'initial')
         else:
             agent_state = 'initial'
     except:
         agent_state = 'initial'
     
-    if agent_state == "initial" or agent_state == "clarifying":
-        return "🤖 **Master Agent** is analyzing your requirements..."
-    elif agent_state == "expert_analysis":
-        return "🎯 **Expert Agent** is identifying gaps and enhancements..."
-    elif agent_state == "suggestions_review":
-        return "🤝 **Master Agent** is presenting expert recommendations..."
-    elif agent_state == "planning":
-        return "📋 **Master Agent** is creating your implementation plan..."
-    else:
-        return "🤖 **Master Agent** is processing your request..."
+    return _AGENT_STATUS_LABELS.get(agent_state, _DEFAULT_AGENT_STATUS_LABEL)
 
-def display_conversation_history():
-    """Display the conversation history with simple chat styling."""
-    if not st.session_state.conversation_history:
-        st.markdown(
-            '<div style="text-align: center; color: #666; margin: 50px 0;">'
-            '💬 Start a conversation by describing your Salesforce requirement'
-            '</div>', 
-            unsafe_allow_html=True
-        )
+def _new_message(role: str, content: str, message_type: str, **extra) -> Dict[str, Any]:
+    """Create a conversation message with its sanitized content precomputed."""
+    message = {
+        'role': role,
+        'content': content,
+        'timestamp': datetime.now().isoformat(),
+        'message_type': message_type,
+        **extra
+    }
+    message['_safe_html'] = _escape_content(content)
+    return message
+
+# Fenced blocks and inline code spans; markdown shows these verbatim, so they are never touched
+_CODE_SEGMENT_RE = re.compile(r"(```.*?(?:```|\Z)|~~~.*?(?:~~~|\Z)|`[^`\n]*`)", re.DOTALL)
+# Start of a raw HTML tag, comment or declaration
+_RAW_TAG_RE = re.compile(r"<(?=[A-Za-z/!?])")
+
+@lru_cache(maxsize=1024)
+def _escape_content(content: str) -> str:
+    """
+    Neutralize raw HTML tags in message content before it is rendered as markdown.
+    Only the "<" opening a tag outside code is escaped; code, "&" and ">" are left
+    as-is because markdown does not decode entities inside code spans or fences.
+    """
+    segments = _CODE_SEGMENT_RE.split(content)
+    # split() with one group alternates prose (even indices) and code (odd indices)
+    for i in range(0, len(segments), 2):
+        segments[i] = _RAW_TAG_RE.sub("&lt;", segments[i])
+    # Close a fence left open at the end so it cannot run into the bubble's closing tags
+    last_code = segments[-2] if len(segments) > 1 else ""
+    fence = last_code[:3]
+    if fence in ("```", "~~~") and not segments[-1] and (len(last_code) < 6 or not last_code.endswith(fence)):
+        segments.append("\n" + fence)
+    return "".join(segments)
+
+def _append_message(message: Dict[str, Any]):
+    """Append a message to the chat history, keeping at most Config.MAX_UI_HISTORY of them."""
+    history = st.session_state.conversation_history
+    history.append(message)
+    # Trimmed a window at a time so the list isn't shifted on every append
+    if len(history) > Config.MAX_UI_HISTORY + CONVERSATION_WINDOW_SIZE:
+        del history[:len(history) - Config.MAX_UI_HISTORY]
+
+def _safe_content(message) -> str:
+    """Get the escaped content of a message, caching it on the message."""
+    safe_html = message.get('_safe_html')
+    if safe_html is None:
+        safe_html = message['_safe_html'] = _escape_content(message['content'])
+    return safe_html
+
+# Chat bubble layouts, filled in per message. The blank lines around {content}
+# end the raw-HTML block opened by the <div>s, so the content is parsed as
+# markdown (code stays code) and a trailing fence cannot swallow the closing tags
+_USER_BUBBLE_HTML = (
+    '<div style="display: flex; justify-content: flex-end; margin: 10px 0;">'
+    '<div style="background: #007bff; color: white; padding: 10px 15px; border-radius: 15px; max-width: 70%; word-wrap: break-word;{pending_style}">'
+    '\n\n{content}\n\n'
+    '</div></div>'
+)
+_AGENT_BUBBLE_HTML = (
+    '<div style="display: flex; justify-content: flex-start; margin: 10px 0;">'
+    '<div style="background: #f1f3f4; color: #333; padding: 10px 15px; border-radius: 15px; max-width: 70%; word-wrap: break-word;">'
+    '\n\n🤖 {content}\n\n'
+    '</div></div>'
+)
+_STREAMING_BUBBLE_HTML = (
+    '<div style="display: flex; justify-content: flex-start; margin: 10px 0;">'
+    '<div style="background: #f1f3f4; color: #333; padding: 10px 15px; border-radius: 15px; max-width: 70%; word-wrap: break-word;">'
+    '<pre style="white-space: pre-wrap; margin: 0; font-family: inherit;">🤖 {content}</pre>'
+    '</div></div>'
+)
+
+def _message_html(message) -> str:
+    """Build the HTML for a single chat bubble."""
+    if message['role'] == 'user':
+        # User message - right aligned, blue background (faded until the agent confirms it)
+        pending_style = " opacity: 0.6;" if message.get('_pending') else ""
+        return _USER_BUBBLE_HTML.format(pending_style=pending_style, content=_safe_content(message))
+    if message.get('_streaming'):
+        # In-flight agent message - plain escaped text, no markdown until it settles
+        return _STREAMING_BUBBLE_HTML.format(content=html.escape(message['content']))
+    # Agent message - left aligned, gray background
+    return _AGENT_BUBBLE_HTML.format(content=_safe_content(message))
+
+def _bubble_html(message) -> str:
+    """Get a message's bubble HTML, caching it on the message until its pending state changes."""
+    if message.get('_streaming'):
+        return _message_html(message)
+    pending = message.get('_pending', False)
+    cached = message.get('_bubble_html')
+    if cached is None or cached[0] != pending:
+        cached = message['_bubble_html'] = (pending, _message_html(message))
+    return cached[1]
+
+def _render_messages(messages):
+    """Render a list of messages as a single markdown element (bubble HTML is cached per message)."""
+    if not messages:
+        return
+    st.markdown("\n".join(_bubble_html(message) for message in messages), unsafe_allow_html=True)
+
+def _load_older_messages():
+    """Widen the history window; runs as a button callback before the next render."""
+    st.session_state.history_window += CONVERSATION_WINDOW_SIZE
+
+def _conversation_history_body():
+    """Render the conversation history with simple chat styling."""
+    history = st.session_state.conversation_history
+    if not history:
+        st.markdown(_WELCOME_HTML, unsafe_allow_html=True)
         return
     
-    # Simple message display
-    for message in st.session_state.conversation_history:
-        if message['role'] == 'user':
-            # User message - right aligned, blue background
-            st.markdown(f'''
-                <div style="display: flex; justify-content: flex-end; margin: 10px 0;">
-                    <div style="background: #007bff; color: white; padding: 10px 15px; border-radius: 15px; max-width: 70%; word-wrap: break-word;">
-                        {message['content']}
-                    </div>
-                </div>
-            ''', unsafe_allow_html=True)
-        elif message['role'] in ['agent', 'orchestrator']:
-            # Agent message - left aligned, gray background  
-            st.markdown(f'''
-                <div style="display: flex; justify-content: flex-start; margin: 10px 0;">
-                    <div style="background: #f1f3f4; color: #333; padding: 10px 15px; border-radius: 15px; max-width: 70%; word-wrap: break-word;">
-                        🤖 {message['content']}
-                    </div>
-                </div>
-            ''', unsafe_allow_html=True)
+    # Only a window of the most recent messages is rendered; "Load older"
+    # widens it a page at a time so long sessions don't slow down every rerun
+    older_count = max(len(history) - st.session_state.history_window, 0)
+    if older_count:
+        st.button(
+            f"Load {min(older_count, CONVERSATION_WINDOW_SIZE)} older messages ({older_count} hidden)",
+            key="load_older_messages",
+            on_click=_load_older_messages
+        )
+    
+    _render_messages(history[older_count:])
 
-def get_agent_info_from_message(message):
-    """Get agent information based on message type with improved detection."""
+# As a fragment, the "Load older" button reruns only the history
+_conversation_history_fragment = st.fragment(_conversation_history_body)
+
+def display_conversation_history():
+    """Display the conversation history with simple chat styling."""
+    _conversation_history_fragment()
+
+# Agent tag -> display info used for message attribution
+_AGENT_INFO = {
+    'schema': {
+        'name': 'Schema Expert',
+        'icon': '📋',
+        'css_class': 'expert-message'
+    },
+    'technical': {
+        'name': 'Technical Architect',
+        'icon': '🏗️',
+        'css_class': 'technical-message'
+    },
+    'dependency': {
+        'name': 'Dependency Resolver',
+        'icon': '📊',
+        'css_class': 'dependency-message'
+    },
+    'orchestrator': {
+        'name': 'Master Orchestrator',
+        'icon': '🎯',
+        'css_class': 'orchestrator-message'
+    },
+    'crewai': {
+        'name': 'CrewAI Team',
+        'icon': '👥',
+        'css_class': 'agent-message'
+    },
+    'error': {
+        'name': 'System',
+        'icon': '⚠️',
+        'css_class': 'agent-message'
+    },
+    'master': {
+        'name': 'Master Agent',
+        'icon': '🤖',
+        'css_class': 'agent-message'
+    }
+}
+
+def _classify_agent(message) -> str:
+    """Work out which agent a message belongs to, returning an _AGENT_INFO key."""
     message_type = message.get('message_type', '')
     message_content = message.get('content', '').lower()
     
     # Improved agent detection based on content and type
     if ('expert' in message_type or 'schema' in message_type or 
         'schema analysis' in message_content or 'object' in message_content):
-        return {
-            'name': 'Schema Expert',
-            'icon': '📋',
-            'css_class': 'expert-message'
-        }
+        return 'schema'
     elif ('technical_design' in message_type or 'technical' in message_type or
           'architecture' in message_content or 'automation' in message_content):
-        return {
-            'name': 'Technical Architect',
-            'icon': '🏗️',
-            'css_class': 'technical-message'
-        }
+        return 'technical'
     elif ('task_creation' in message_type or 'dependency' in message_type or
           'implementation' in message_content or 'tasks' in message_content):
-        return {
-            'name': 'Dependency Resolver',
-            'icon': '📊',
-            'css_class': 'dependency-message'
-        }
+        return 'dependency'
     elif 'orchestrator' in message_type or message.get('role') == 'orchestrator':
-        return {
-            'name': 'Master Orchestrator',
-            'icon': '🎯',
-            'css_class': 'orchestrator-message'
-        }
+        return 'orchestrator'
     elif 'crewai' in message_type or 'crew' in message_content:
-        return {
-            'name': 'CrewAI Team',
-            'icon': '👥',
-            'css_class': 'agent-message'
-        }
+        return 'crewai'
     elif 'error' in message_type or message.get('role') == 'error':
-        return {
-            'name': 'System',
-            'icon': '⚠️',
-            'css_class': 'agent-message'
-        }
-    else:
-        return {
-            'name': 'Master Agent',
-            'icon': '🤖',
-            'css_class': 'agent-message'
-        }
+        return 'error'
+    return 'master'
+
+def get_agent_info_from_message(message):
+    """Get agent information based on message type with improved detection."""
+    tag = message.get('_agent_tag')
+    if tag is None:
+        # Classified on first use and cached on the message
+        tag = message['_agent_tag'] = _classify_agent(message)
+    return _AGENT_INFO[tag]
+
+_ACTIVITY_BUBBLE_HTML = '''
+            <div class="agent-status">
+                <div class="message-bubble">
+                    {icon} <strong>{agent}</strong> {activity}
+                    <span style="opacity: 0.8; font-size: 0.8rem;">(working for {elapsed:.1f}s)</span>
+                </div>
+            </div>
+'''
+
+@lru_cache(maxsize=64)
+def _activity_icon(agent_name: str) -> str:
+    """Get the icon for an agent name."""
+    if "Schema" in agent_name or "Expert" in agent_name:
+        return "📋"
+    elif "Technical" in agent_name:
+        return "🏗️"
+    elif "Dependency" in agent_name:
+        return "📊"
+    elif "Master" in agent_name:
+        return "🤖"
+    return "🔄"
+
+def _render_active_agents():
+    """Render a status bubble for each agent that is still working."""
+    active_agents = list(st.session_state.active_activities.values())
+    if not active_agents:
+        return False
+    
+    # All bubbles go out as one markdown element
+    now = time.monotonic()
+    st.markdown("".join(
+        _ACTIVITY_BUBBLE_HTML.format(
+            icon=_activity_icon(activity['agent']),
+            agent=activity['agent'],
+            activity=activity['activity'],
+            elapsed=now - activity['start_time']
+        )
+        for activity in active_agents
+    ), unsafe_allow_html=True)
+    
+    return True
+
+@st.fragment(run_every=ACTIVITY_REFRESH_SECONDS)
+def _activity_fragment():
+    """Re-render only the activity panel on a timer while agents are working."""
+    if not st.session_state.processing:
+        return
+    _render_active_agents()
 
 def display_agent_activities():
     """Display current agent activities with live status updates."""
-    import time
-    
-    if 'agent_activities' not in st.session_state or not st.session_state.agent_activities:
+    if not st.session_state.get('active_activities'):
         return
     
-    # Only show active agent activities (working status)
-    active_agents = [a for a in st.session_state.agent_activities if a['status'] == 'active']
+    if not st.session_state.processing:
+        _render_active_agents()
+        return
     
-    if active_agents:
-        for activity in active_agents:
-            elapsed = time.time() - activity['start_time']
-            
-            # Get agent icon
-            agent_icon = "🔄"
-            if "Schema" in activity['agent'] or "Expert" in activity['agent']:
-                agent_icon = "📋"
-            elif "Technical" in activity['agent']:
-                agent_icon = "🏗️"
-            elif "Dependency" in activity['agent']:
-                agent_icon = "📊"
-            elif "Master" in activity['agent']:
-                agent_icon = "🤖"
-            
-            st.markdown(f'''
-                <div class="agent-status">
-                    <div class="message-bubble">
-                        {agent_icon} <strong>{activity['agent']}</strong> {activity['activity']}
-                        <span style="opacity: 0.8; font-size: 0.8rem;">(working for {elapsed:.1f}s)</span>
-                    </div>
-                </div>
-            ''', unsafe_allow_html=True)
-        
-        # Auto-refresh while agents are working
-        if st.session_state.processing:
-            time.sleep(0.5)
-            st.rerun()
+    _activity_fragment()
+
+# Agents shown in the sidebar status indicators
+_STATUS_AGENTS = (
+    {"name": "Master Agent", "icon": "🎯", "key": "master"},
+    {"name": "Schema Expert", "icon": "🗄️", "key": "schema"},
+    {"name": "Technical Architect", "icon": "🏗️", "key": "technical"},
+    {"name": "Dependency Resolver", "icon": "📋", "key": "dependency"}
+)
 
 def display_agent_status_indicators():
     """Display visual indicators for agent status in the sidebar."""
     
-    # Define all agents and their info
-    agents = [
-        {"name": "Master Agent", "icon": "🎯", "key": "master"},
-        {"name": "Schema Expert", "icon": "🗄️", "key": "schema"},
-        {"name": "Technical Architect", "icon": "🏗️", "key": "technical"},
-        {"name": "Dependency Resolver", "icon": "📋", "key": "dependency"}
-    ]
-    
     # Determine current active agent based on conversation state and activities
     active_agent = get_current_active_agent()
     
-    # Custom CSS for agent status indicators
-    st.markdown("""
-    <style>
-    .agent-indicator {
-        display: flex;
-        align-items: center;
-        padding: 8px 12px;
-        margin: 4px 0;
-        border-radius: 20px;
-        font-size: 0.85rem;
-        font-weight: 500;
-        transition: all 0.3s ease;
-        border: 2px solid transparent;
-    }
-    
-    .agent-indicator.active {
-        background: linear-gradient(135deg, #28a745 0%, #20c997 100%);
-        color: white;
-        border-color: #1e7e34;
-        box-shadow: 0 2px 8px rgba(40, 167, 69, 0.3);
-        animation: pulse-green 2s infinite;
-    }
-    
-    .agent-indicator.inactive {
-        background: #f8f9fa;
-        color: #6c757d;
-        border-color: #dee2e6;
-    }
-    
-    .agent-indicator.pending {
-        background: linear-gradient(135deg, #ffc107 0%, #fd7e14 100%);
-        color: #212529;
-        border-color: #e0a800;
-        box-shadow: 0 2px 8px rgba(255, 193, 7, 0.3);
-    }
-    
-    .agent-icon {
-        margin-right: 8px;
-        font-size: 1rem;
-    }
-    
-    @keyframes pulse-green {
-        0%, 100% { transform: scale(1); }
-        50% { transform: scale(1.02); }
-    }
-    
-    .agent-status-container {
-        margin: 10px 0;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-    
-    # Display agent indicators
-    st.markdown('<div class="agent-status-container">', unsafe_allow_html=True)
-    
-    for agent in agents:
+    # Build every indicator, then emit the container as a single element
+    # (styles live in the app stylesheet)
+    indicators = []
+    for agent in _STATUS_AGENTS:
         # Determine status
         if active_agent == agent["key"]:
             status_class = "active"
             # Show working time if available
             if st.session_state.get('agent_start_time'):
-                elapsed = time.time() - st.session_state.agent_start_time
+                elapsed = time.monotonic() - st.session_state.agent_start_time
                 status_text = f"🟢 Working ({elapsed:.0f}s)"
             else:
                 status_text = "🟢 Active"
@@ -703,17 +938,18 @@ def display_agent_status_indicators():
             status_text = "⚪ Idle"
         
         # Create the indicator with status text
-        indicator_html = f"""
+        indicators.append(f"""
         <div class="agent-indicator {status_class}">
             <span class="agent-icon">{agent["icon"]}</span>
             <span>{agent["name"]}</span>
             <small style="margin-left: auto; opacity: 0.8;">{status_text.split(' ', 1)[1] if ' ' in status_text else ''}</small>
         </div>
-        """
-        
-        st.markdown(indicator_html, unsafe_allow_html=True)
+        """)
     
-    st.markdown('</div>', unsafe_allow_html=True)
+    st.markdown(
+        f'<div class="agent-status-container">{"".join(indicators)}</div>',
+        unsafe_allow_html=True
+    )
 
 def update_agent_status(agent_key: str, status: str = "active"):
     """Update the current active agent status for real-time display."""
@@ -725,7 +961,7 @@ def update_agent_status(agent_key: str, status: str = "active"):
     
     if status == "active":
         st.session_state.current_active_agent = agent_key
-        st.session_state.agent_start_time = time.time()
+        st.session_state.agent_start_time = time.monotonic()
     elif status == "completed":
         st.session_state.current_active_agent = None
         st.session_state.agent_start_time = None
@@ -738,22 +974,21 @@ def get_current_active_agent():
         return st.session_state.current_active_agent
     
     # First check if any agent is actively working (from agent activities)
-    if 'agent_activities' in st.session_state:
-        for activity in st.session_state.agent_activities:
-            if activity.get('status') == 'active':
-                agent_name = activity.get('agent', '').lower()
-                if 'master' in agent_name:
-                    return 'master'
-                elif 'schema' in agent_name or 'expert' in agent_name:
-                    return 'schema'
-                elif 'technical' in agent_name or 'architect' in agent_name:
-                    return 'technical'
-                elif 'dependency' in agent_name or 'resolver' in agent_name:
-                    return 'dependency'
+    for agent_name in st.session_state.get('active_activities', {}):
+        agent_name = agent_name.lower()
+        if 'master' in agent_name:
+            return 'master'
+        elif 'schema' in agent_name or 'expert' in agent_name:
+            return 'schema'
+        elif 'technical' in agent_name or 'architect' in agent_name:
+            return 'technical'
+        elif 'dependency' in agent_name or 'resolver' in agent_name:
+            return 'dependency'
     
     # If no active activities, determine based on conversation state
-    if st.session_state.agent:
-        state = st.session_state.agent.conversation_state
+    agent = st.session_state.agent
+    if agent:
+        state = agent.conversation_state
         
         if state in ["initial", "clarifying", "final_review", "planning"]:
             return 'master'
@@ -770,10 +1005,11 @@ def get_current_active_agent():
 def is_agent_pending(agent_key):
     """Check if an agent is pending to work next based on the current flow."""
     
-    if not st.session_state.agent:
+    agent = st.session_state.agent
+    if not agent:
         return False
         
-    state = st.session_state.agent.conversation_state
+    state = agent.conversation_state
     
     # Define the typical flow progression
     if state == "initial" and agent_key == "schema":
@@ -785,223 +1021,278 @@ def is_agent_pending(agent_key):
     
     return False
 
-def display_sidebar():
-    """Display the sidebar with session information and controls."""
-    with st.sidebar:
-        st.markdown(f'''
-        <div style="text-align: center; padding: 0.5rem 0; margin-bottom: 1rem;">
-            <div style="font-size: 1.2rem; font-weight: bold; color: #0176D3;">
-                ⚡ {Config.APP_NAME}
-            </div>
-            <div style="font-size: 0.8rem; color: #666; margin-top: 0.2rem;">
-                {Config.APP_DESCRIPTION}
-            </div>
-            <div style="font-size: 0.7rem; color: #888; margin-top: 0.3rem;">
-                v{Config.APP_VERSION}
-            </div>
+@st.cache_resource
+def _validated_config():
+    """Check the required configuration keys once per server process."""
+    if not Config.validate_required_keys():
+        return None
+    return Config
+
+@st.cache_data(show_spinner=False)
+def _sidebar_header_html(app_name: str, app_description: str, app_version: str) -> str:
+    """Build the sidebar header; keyed on the app metadata, so it is built once."""
+    return f'''
+    <div style="text-align: center; padding: 0.5rem 0; margin-bottom: 1rem;">
+        <div style="font-size: 1.2rem; font-weight: bold; color: #0176D3;">
+            ⚡ {app_name}
         </div>
-        ''', unsafe_allow_html=True)
-        
-        # Configuration status
-        st.subheader("🔧 Configuration")
+        <div style="font-size: 0.8rem; color: #666; margin-top: 0.2rem;">
+            {app_description}
+        </div>
+        <div style="font-size: 0.7rem; color: #888; margin-top: 0.3rem;">
+            v{app_version}
+        </div>
+    </div>
+    '''
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _list_saved_sessions(history_path: str, session_id: str, _memory_manager) -> List[str]:
+    """
+    List saved sessions; the directory scan is reused for a short time across reruns.
+    Keyed on the current session id so a newly started session is listed immediately.
+    """
+    return _memory_manager.get_all_sessions()
+
+def _sidebar_body():
+    """Render the sidebar contents with session information and controls."""
+    # Bound once; each st.session_state attribute access goes through its proxy
+    agent = st.session_state.agent
+    unified_agent = st.session_state.unified_agent
+    
+    st.markdown(
+        _sidebar_header_html(Config.APP_NAME, Config.APP_DESCRIPTION, Config.APP_VERSION),
+        unsafe_allow_html=True
+    )
+    
+    # Configuration status
+    st.subheader("🔧 Configuration")
+    if _validated_config() is not None:
         st.success("✅ OpenAI API configured")
+    else:
+        st.warning("⚠️ OpenAI API key not found in environment")
+    
+    # System Status Display (Automatic - No user selection needed)
+    st.subheader("🎯 AI Agent System")
+    
+    # Brief explanation
+    st.caption("🤖 **Automatic Multi-Agent Orchestration** - The system intelligently coordinates specialist agents behind the scenes")
+    
+    # Display current system status
+    if unified_agent:
+        system_status = unified_agent.get_system_status()
+        active_system = system_status.get('active_system', 'unknown')
         
-        # System Status Display (Automatic - No user selection needed)
-        st.subheader("🎯 AI Agent System")
+        if active_system == 'orchestrator':
+            st.success("🎯 **Master Orchestrator Active** - Coordinating Schema Expert, Technical Architect, and Dependency Resolver agents")
+        elif active_system == 'crewai':
+            st.info("🚀 **CrewAI Active** - Multi-agent collaboration system")
+        elif active_system == 'legacy':
+            st.info("⚙️ **Legacy System Active** - Basic agent system")
+        else:
+            st.warning(f"🔄 **System Status**: {active_system}")
+    else:
+        st.info("🔄 **Initializing Master Orchestrator...**")
+    
+    if st.session_state.use_crewai:
+        st.caption("✨ **CrewAI Mode**: True autonomous agent collaboration")
         
-        # Brief explanation
-        st.caption("🤖 **Automatic Multi-Agent Orchestration** - The system intelligently coordinates specialist agents behind the scenes")
+        interactive_mode = st.selectbox(
+            "Interactive Review",
+            options=['auto', 'always', 'never'],
+            index=0 if st.session_state.crew_interactive_mode == 'auto' else 
+                  1 if st.session_state.crew_interactive_mode == 'always' else 2,
+            help="When to enable human review of agent recommendations"
+        )
+        st.session_state.crew_interactive_mode = interactive_mode
         
-        # Display current system status
-        if st.session_state.unified_agent:
-            system_status = st.session_state.unified_agent.get_system_status()
-            active_system = system_status.get('active_system', 'unknown')
+    else:
+        st.caption("⚙️ **Legacy Mode**: Manual agent orchestration")
+    
+    # Salesforce connection status
+    if unified_agent and hasattr(unified_agent.legacy_system, 'schema_expert'):
+        schema_expert = unified_agent.legacy_system.schema_expert
+        if hasattr(schema_expert, 'sf_connected') and schema_expert.sf_connected:
+            st.success("🟢 Salesforce org connected")
+            if st.button("🔍 Test SF Connection"):
+                # Salesforce is only called on a click; the last result is kept
+                # in session state so later reruns redisplay it without a request
+                with st.spinner("Testing Salesforce connection..."):
+                    st.session_state.sf_connection_result = schema_expert.sf_connector.test_connection()
             
-            if active_system == 'orchestrator':
-                st.success("🎯 **Master Orchestrator Active** - Coordinating Schema Expert, Technical Architect, and Dependency Resolver agents")
-            elif active_system == 'crewai':
-                st.info("🚀 **CrewAI Active** - Multi-agent collaboration system")
-            elif active_system == 'legacy':
-                st.info("⚙️ **Legacy System Active** - Basic agent system")
-            else:
-                st.warning(f"🔄 **System Status**: {active_system}")
+            test_result = st.session_state.get('sf_connection_result')
+            if test_result:
+                if test_result.get('connected'):
+                    org_info = test_result.get('org_info', {})
+                    auth_type = test_result.get('auth_type', 'unknown')
+                    auth_display = "🎯 Client Credentials" if auth_type == "client_credentials" else "🔄 Username-Password"
+                    
+                    st.success(f"✅ Connected to: {org_info.get('Name', 'Unknown Org')}")
+                    st.info(f"🔐 Auth Method: {auth_display}")
+                    st.info(f"📊 Available objects: {test_result.get('sobjects_count', 'Unknown')}")
+                else:
+                    st.error(f"❌ Connection failed: {test_result.get('error')}")
         else:
-            st.info("🔄 **Initializing Master Orchestrator...**")
+            st.warning("🟡 Salesforce configured but not connected")
+    else:
+        st.info("🔵 Salesforce will connect when agent starts")
+    
+    # Reconfigure button
+    st.markdown("---")
+    if st.button("⚙️ Reconfigure Credentials", help="Change your API keys and Salesforce settings"):
+        # Reset configuration
+        st.session_state.config_complete = False
+        st.session_state.agent = None
+        st.session_state.conversation_history = []
+        st.session_state.current_session_id = None
+        # Reset auth method selection
+        st.session_state.auth_method_selected = False
+        st.session_state.use_username_password = False
+        st.session_state.last_auth_method = ""
+        st.rerun()
+    
+    # Agent Status Visual Indicator
+    st.subheader("🤖 Agent Status")
+    display_agent_status_indicators()
+    
+    # Session information
+    st.subheader("📊 Session Info")
+    if st.session_state.current_session_id:
+        st.info(f"**Session ID:** {st.session_state.current_session_id}")
         
-        if st.session_state.use_crewai:
-            st.caption("✨ **CrewAI Mode**: True autonomous agent collaboration")
+        if agent:
+            state = agent.conversation_state
+            st.markdown(f"**Status:** {get_status_badge(state)}", unsafe_allow_html=True)
             
-            interactive_mode = st.selectbox(
-                "Interactive Review",
-                options=['auto', 'always', 'never'],
-                index=0 if st.session_state.crew_interactive_mode == 'auto' else 
-                      1 if st.session_state.crew_interactive_mode == 'always' else 2,
-                help="When to enable human review of agent recommendations"
+            # Progress indicator
+            progress = _PROGRESS_MAPPING.get(state, 0)
+            st.progress(progress)
+    
+    # Session management
+    st.subheader("🗂️ Session Management")
+    
+    # Switching sessions while a reply is pending would land that reply in the
+    # new chat and close the agent system the worker is still writing through;
+    # the full rerun that collects the reply re-enables these buttons
+    busy = st.session_state.processing
+    busy_help = "Available once the current reply has finished" if busy else None
+    
+    if st.button("🆕 New Session", type="primary", disabled=busy, help=busy_help):
+        _list_saved_sessions.clear()
+        if unified_agent:
+            # Flush and stop its writer thread; a fresh system is built on the rerun
+            unified_agent.close()
+            st.session_state.unified_agent = None
+        st.session_state.agent = None
+        st.session_state.conversation_history = []
+        st.session_state.current_session_id = None
+        st.session_state.pop('sf_connection_result', None)
+        st.rerun()
+    
+    # Load existing sessions
+    if agent:
+        memory_manager = agent.memory_manager
+        available_sessions = _list_saved_sessions(
+            Config.CONVERSATION_HISTORY_PATH, memory_manager.session_id, memory_manager
+        )
+        if available_sessions:
+            st.selectbox(
+                "📁 Load Previous Session",
+                options=[""] + available_sessions,
+                key="session_selector",
+                help="Select a previous session to continue"
             )
-            st.session_state.crew_interactive_mode = interactive_mode
             
-        else:
-            st.caption("⚙️ **Legacy Mode**: Manual agent orchestration")
-        
-        # Salesforce connection status
-        if st.session_state.unified_agent and hasattr(st.session_state.unified_agent.legacy_system, 'schema_expert'):
-            schema_expert = st.session_state.unified_agent.legacy_system.schema_expert
-            if hasattr(schema_expert, 'sf_connected') and schema_expert.sf_connected:
-                st.success("🟢 Salesforce org connected")
-                if st.button("🔍 Test SF Connection"):
-                    with st.spinner("Testing Salesforce connection..."):
-                        test_result = schema_expert.sf_connector.test_connection()
-                        if test_result.get('connected'):
-                            org_info = test_result.get('org_info', {})
-                            auth_type = test_result.get('auth_type', 'unknown')
-                            auth_display = "🎯 Client Credentials" if auth_type == "client_credentials" else "🔄 Username-Password"
-                            
-                            st.success(f"✅ Connected to: {org_info.get('Name', 'Unknown Org')}")
-                            st.info(f"🔐 Auth Method: {auth_display}")
-                            st.info(f"📊 Available objects: {test_result.get('sobjects_count', 'Unknown')}")
-                        else:
-                            st.error(f"❌ Connection failed: {test_result.get('error')}")
-            else:
-                st.warning("🟡 Salesforce configured but not connected")
-        else:
-            st.info("🔵 Salesforce will connect when agent starts")
-        
-        # Reconfigure button
-        st.markdown("---")
-        if st.button("⚙️ Reconfigure Credentials", help="Change your API keys and Salesforce settings"):
-            # Reset configuration
-            st.session_state.config_complete = False
-            st.session_state.agent = None
-            st.session_state.conversation_history = []
-            st.session_state.current_session_id = None
-            # Reset auth method selection
-            st.session_state.auth_method_selected = False
-            st.session_state.use_username_password = False
-            st.session_state.last_auth_method = ""
-            st.rerun()
-        
-        # Agent Status Visual Indicator
-        st.subheader("🤖 Agent Status")
-        display_agent_status_indicators()
-        
-        # Session information
-        st.subheader("📊 Session Info")
-        if st.session_state.current_session_id:
-            st.info(f"**Session ID:** {st.session_state.current_session_id}")
-            
-            if st.session_state.agent:
-                state = st.session_state.agent.conversation_state
-                st.markdown(f"**Status:** {get_status_badge(state)}", unsafe_allow_html=True)
-                
-                # Progress indicator
-                progress_mapping = {
-                    "initial": 0.10,
-                    "clarifying": 0.25,
-                    "expert_analysis": 0.40,
-                    "suggestions_review": 0.55,
-                    "technical_design": 0.70,
-                    "task_creation": 0.85,
-                    "final_review": 0.95,
-                    "planning": 0.90,
-                    "completed": 1.0
-                }
-                progress = progress_mapping.get(state, 0)
-                st.progress(progress)
-        
-        # Session management
-        st.subheader("🗂️ Session Management")
-        
-        if st.button("🆕 New Session", type="primary"):
-            st.session_state.agent = None
-            st.session_state.conversation_history = []
-            st.session_state.current_session_id = None
-            st.rerun()
+            if st.session_state.session_selector and st.session_state.session_selector != st.session_state.current_session_id:
+                if st.button("🔄 Load Selected Session", disabled=busy, help=busy_help):
+                    load_session(st.session_state.session_selector)
+    
+    # Export options
+    if st.session_state.conversation_history:
+        st.subheader("📤 Export")
+        
+        # Export conversation with safe serialization; messages rotated out of
+        # memory are only read from the archive when asked for
+        export_history = st.session_state.conversation_history
+        if unified_agent and st.toggle("Include archived messages", key="export_include_archive"):
+            export_history = _with_archived_messages(
+                unified_agent.memory_manager.get_archived_messages(), export_history
+            )
+        conversation_json = get_conversation_export(
+            st.session_state.current_session_id, export_history
+        )
+        st.download_button(
+            label="💾 Download Conversation",
+            data=conversation_json,
+            file_name=f"conversation_{st.session_state.current_session_id}.json",
+            mime="application/json"
+        )
         
-        # Load existing sessions
-        if st.session_state.agent:
-            available_sessions = st.session_state.agent.memory_manager.get_all_sessions()
-            if available_sessions:
-                st.selectbox(
-                    "📁 Load Previous Session",
-                    options=[""] + available_sessions,
-                    key="session_selector",
-                    help="Select a previous session to continue"
+        # Export implementation plan if available
+        if agent and agent.conversation_state == "completed":
+            implementation_plan = getattr(agent.memory_manager, 'implementation_plan', None)
+            if implementation_plan:
+                plan_json = get_plan_export(st.session_state.current_session_id, implementation_plan)
+                st.download_button(
+                    label="📋 Download Implementation Plan",
+                    data=plan_json,
+                    file_name=f"implementation_plan_{st.session_state.current_session_id}.json",
+                    mime="application/json"
                 )
-                
-                if st.session_state.session_selector and st.session_state.session_selector != st.session_state.current_session_id:
-                    if st.button("🔄 Load Selected Session"):
-                        load_session(st.session_state.session_selector)
-        
-        # Export options
-        if st.session_state.conversation_history:
-            st.subheader("📤 Export")
-            
-            # Export conversation with safe serialization
-            conversation_json = safe_json_serialize(st.session_state.conversation_history)
-            st.download_button(
-                label="💾 Download Conversation",
-                data=conversation_json,
-                file_name=f"conversation_{st.session_state.current_session_id}.json",
-                mime="application/json"
-            )
-            
-            # Export implementation plan if available
-            if st.session_state.agent and st.session_state.agent.conversation_state == "completed":
-                if hasattr(st.session_state.agent.memory_manager, 'implementation_plan') and st.session_state.agent.memory_manager.implementation_plan:
-                    plan_json = json.dumps(st.session_state.agent.memory_manager.implementation_plan, indent=2)
-                    st.download_button(
-                        label="📋 Download Implementation Plan",
-                        data=plan_json,
-                        file_name=f"implementation_plan_{st.session_state.current_session_id}.json",
-                        mime="application/json"
-                    )
+
+# As a fragment, sidebar widgets rerun only the sidebar instead of the whole app
+_sidebar_fragment = st.fragment(_sidebar_body)
+
+def display_sidebar():
+    """Display the sidebar with session information and controls."""
+    with st.sidebar:
+        _sidebar_fragment()
 
 def display_expert_suggestions_panel():
     """Display expert suggestions in a special panel if available."""
-    if (st.session_state.agent and 
-        hasattr(st.session_state.agent, 'expert_suggestions') and 
-        st.session_state.agent.expert_suggestions and
-        st.session_state.agent.conversation_state == "suggestions_review"):
-        
-        st.markdown("### 💡 Expert Suggestions Panel")
-        
-        expert_analysis = st.session_state.agent.expert_suggestions
-        
-        # Create expandable sections for different types of suggestions
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            if expert_analysis.get("requirement_gaps"):
-                with st.expander("🔍 Missing Requirements", expanded=True):
-                    for gap in expert_analysis["requirement_gaps"]:
-                        st.markdown(f"• {gap}")
-            
-            if expert_analysis.get("best_practices"):
-                with st.expander("⭐ Best Practices", expanded=False):
-                    for practice in expert_analysis["best_practices"]:
-                        st.markdown(f"• {practice}")
-        
-        with col2:
-            if expert_analysis.get("suggested_enhancements"):
-                with st.expander("🚀 Value Enhancements", expanded=True):
-                    for enhancement in expert_analysis["suggested_enhancements"]:
-                        st.markdown(f"• {enhancement}")
-            
-            if expert_analysis.get("implementation_considerations"):
-                with st.expander("⚙️ Implementation Notes", expanded=False):
-                    for consideration in expert_analysis["implementation_considerations"]:
-                        st.markdown(f"• {consideration}")
-        
-        # Note: User can respond via chat instead of buttons
-        st.markdown("#### 💬 **Please respond in the chat below with your preference**")
+    # Cheapest checks first; outside suggestions review there is nothing to draw
+    agent = st.session_state.agent
+    if not agent or agent.conversation_state != "suggestions_review":
+        return
+    expert_analysis = getattr(agent, 'expert_suggestions', None)
+    if not expert_analysis:
+        return
+    
+    st.markdown("### 💡 Expert Suggestions Panel")
+    
+    # Create expandable sections for different types of suggestions
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        if expert_analysis.get("requirement_gaps"):
+            with st.expander("🔍 Missing Requirements", expanded=True):
+                st.markdown("\n".join(f"- {item}" for item in expert_analysis["requirement_gaps"]))
+    
+        if expert_analysis.get("best_practices"):
+            with st.expander("⭐ Best Practices", expanded=False):
+                st.markdown("\n".join(f"- {item}" for item in expert_analysis["best_practices"]))
+    
+    with col2:
+        if expert_analysis.get("suggested_enhancements"):
+            with st.expander("🚀 Value Enhancements", expanded=True):
+                st.markdown("\n".join(f"- {item}" for item in expert_analysis["suggested_enhancements"]))
+    
+        if expert_analysis.get("implementation_considerations"):
+            with st.expander("⚙️ Implementation Notes", expanded=False):
+                st.markdown("\n".join(f"- {item}" for item in expert_analysis["implementation_considerations"]))
+    
+    # Note: User can respond via chat instead of buttons
+    st.markdown("#### 💬 **Please respond in the chat below with your preference**")
 
 def load_session(session_id: str):
     """Load an existing session."""
     try:
+        # Built per browser session: the agent is mutable state and must not be shared
+        from agents.master_agent import SalesforceRequirementDeconstructorAgent
         agent = SalesforceRequirementDeconstructorAgent(session_id)
         st.session_state.agent = agent
         st.session_state.current_session_id = session_id
         st.session_state.conversation_history = agent.get_conversation_history()
+        st.session_state.pop('sf_connection_result', None)
         st.success(f"Loaded session: {session_id}")
         st.rerun()
     except Exception as e:
@@ -1074,6 +1365,7 @@ def process_user_input(user_input: str):
             
     except Exception as e:
         # Handle unexpected errors
+        complete_all_agent_activities()
         error_response = error_handler.handle_error(e, "User input processing")
         formatted_error = format_error_for_ui(error_response)
         st.error(f"{formatted_error['title']}: {formatted_error['message']}")
@@ -1091,22 +1383,21 @@ def process_user_input_crewai(user_input: str, use_interactive: bool = None):
         st.warning("Please enter a valid requirement or message.")
         return
     
+    # CrewAI implementation (fallback) is imported on first use so the
+    # crew definitions aren't loaded on every cold start
+    from salesforce_crew import analyze_salesforce_requirement, is_complex_requirement
+    
     # Show processing indicator
     st.session_state.processing = True
     
     try:
         # Add user message to conversation history immediately
-        user_message = {
-            'role': 'user',
-            'content': user_input,
-            'timestamp': datetime.now().isoformat(),
-            'message_type': 'requirement'
-        }
+        user_message = _new_message('user', user_input, 'requirement')
         
         if 'conversation_history' not in st.session_state:
             st.session_state.conversation_history = []
         
-        st.session_state.conversation_history.append(user_message)
+        _append_message(user_message)
         
         # Determine if we should use interactive mode based on settings
         if use_interactive is None:
@@ -1118,16 +1409,16 @@ def process_user_input_crewai(user_input: str, use_interactive: bool = None):
             else:  # auto
                 use_interactive = is_complex_requirement(user_input)
         
-        # Show crew launch message
+        # One placeholder carries the launch notice and then the progress,
+        # so each stage replaces the previous element instead of stacking
         crew_type = "Interactive" if use_interactive else "Standard"
-        st.info(f"🚀 Launching {crew_type} Salesforce Implementation Crew...")
-        
+        progress_placeholder = st.empty()
+        launch_notice = f"🚀 Launching {crew_type} Salesforce Implementation Crew..."
         if use_interactive:
-            st.info("💡 Complex requirement detected - human review will be available")
+            launch_notice += "\n\n💡 Complex requirement detected - human review will be available"
+        progress_placeholder.info(launch_notice)
         
         # Execute CrewAI analysis with progress tracking
-        progress_placeholder = st.empty()
-        
         with st.spinner("🤖 Agents are collaborating on your requirement..."):
             try:
                 # Initialize status tracking
@@ -1166,14 +1457,13 @@ def process_user_input_crewai(user_input: str, use_interactive: bool = None):
             serializable_result = make_json_serializable(result)
             
             # Add crew result to conversation history
-            crew_message = {
-                'role': 'agent',
-                'content': f"✅ **Implementation Plan Complete!**\n\nThe {crew_type} crew has successfully analyzed your requirement and created a comprehensive implementation plan.",
-                'timestamp': datetime.now().isoformat(),
-                'message_type': 'crew_result',
-                'crew_data': serializable_result
-            }
-            st.session_state.conversation_history.append(crew_message)
+            crew_message = _new_message(
+                'agent',
+                f"✅ **Implementation Plan Complete!**\n\nThe {crew_type} crew has successfully analyzed your requirement and created a comprehensive implementation plan.",
+                'crew_result',
+                crew_data=serializable_result
+            )
+            _append_message(crew_message)
             
             # Display results
             display_crewai_results(result)
@@ -1207,27 +1497,36 @@ def process_user_input_crewai(user_input: str, use_interactive: bool = None):
                 st.error(f"❌ **Analysis Failed**: {error_msg}")
             
             # Add error to conversation history
-            error_message = {
-                'role': 'agent', 
-                'content': f"❌ **Analysis Failed**\n\n{error_msg}\n\n{suggestion if suggestion else ''}",
-                'timestamp': datetime.now().isoformat(),
-                'message_type': 'error'
-            }
-            st.session_state.conversation_history.append(error_message)
+            error_message = _new_message(
+                'agent',
+                f"❌ **Analysis Failed**\n\n{error_msg}\n\n{suggestion if suggestion else ''}",
+                'error'
+            )
+            _append_message(error_message)
     
     except Exception as e:
-        error_message = {
-            'role': 'agent',
-            'content': f"❌ **System Error**\n\nAn unexpected error occurred: {str(e)}",
-            'timestamp': datetime.now().isoformat(),
-            'message_type': 'system_error'
-        }
-        st.session_state.conversation_history.append(error_message)
+        error_message = _new_message(
+            'agent',
+            f"❌ **System Error**\n\nAn unexpected error occurred: {str(e)}",
+            'system_error'
+        )
+        _append_message(error_message)
         st.error(f"System error: {str(e)}")
         
     finally:
         st.session_state.processing = False
 
+# Legacy agent result type -> UI feedback
+_LEGACY_RESULT_HANDLERS = {
+    'implementation_plan': lambda result: st.success("🎉 Implementation plan created successfully!"),
+    'expert_suggestions': lambda result: st.success("💡 Expert suggestions ready for your review!"),
+    'error': lambda result: st.error(f"Error: {result.get('message', 'Unknown error')}"),
+}
+
+def _default_result_handler(result):
+    """Feedback for result types without a dedicated handler."""
+    st.info("Agent response processed.")
+
 def process_user_input_legacy(user_input: str):
     """
     Process user input using the legacy agent system.
@@ -1240,6 +1539,8 @@ def process_user_input_legacy(user_input: str):
     
     # Initialize agent if not already done
     if not st.session_state.agent:
+        from agents.master_agent import SalesforceRequirementDeconstructorAgent
+        
         st.session_state.agent = SalesforceRequirementDeconstructorAgent()
         st.session_state.current_session_id = st.session_state.agent.get_session_id()
     
@@ -1248,17 +1549,12 @@ def process_user_input_legacy(user_input: str):
     
     try:
         # Add user message to conversation history
-        user_message = {
-            'role': 'user',
-            'content': user_input,
-            'timestamp': datetime.now().isoformat(),
-            'message_type': 'requirement'
-        }
+        user_message = _new_message('user', user_input, 'requirement')
         
         if 'conversation_history' not in st.session_state:
             st.session_state.conversation_history = []
         
-        st.session_state.conversation_history.append(user_message)
+        _append_message(user_message)
         
         # Process through legacy agent system
         st.info("⚙️ Processing with legacy agent system...")
@@ -1270,23 +1566,16 @@ def process_user_input_legacy(user_input: str):
         st.session_state.conversation_history = st.session_state.agent.get_conversation_history()
         
         # Handle result
-        if result.get('type') == 'implementation_plan':
-            st.success("🎉 Implementation plan created successfully!")
-        elif result.get('type') == 'expert_suggestions':
-            st.success("💡 Expert suggestions ready for your review!")
-        elif result.get('type') == 'error':
-            st.error(f"Error: {result.get('message', 'Unknown error')}")
-        else:
-            st.info("Agent response processed.")
+        handler = _LEGACY_RESULT_HANDLERS.get(result.get('type'), _default_result_handler)
+        handler(result)
     
     except Exception as e:
-        error_message = {
-            'role': 'agent',
-            'content': f"❌ **Legacy System Error**\n\nAn error occurred: {str(e)}",
-            'timestamp': datetime.now().isoformat(),
-            'message_type': 'system_error'
-        }
-        st.session_state.conversation_history.append(error_message)
+        error_message = _new_message(
+            'agent',
+            f"❌ **Legacy System Error**\n\nAn error occurred: {str(e)}",
+            'system_error'
+        )
+        _append_message(error_message)
         st.error(f"Legacy system error: {str(e)}")
         
     finally:
@@ -1559,10 +1848,8 @@ def display_crewai_results(result: dict):
                     key=f"download_{output_name}_btn"
                 )
 
-def show_configuration_popup():
-    """Show configuration popup to collect API keys and Salesforce credentials."""
-    # Custom CSS for the configuration page
-    st.markdown("""
+# Configuration page stylesheet and header, static for the process lifetime
+_CONFIG_CSS = """
     <style>
         .config-container {
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
@@ -1584,16 +1871,49 @@ def show_configuration_popup():
             border-radius: 8px;
         }
     </style>
-    """, unsafe_allow_html=True)
-    
-    st.markdown("""
+    """
+
+_CONFIG_HEADER_HTML = """
     <div class="config-container">
         <div style="text-align: center;">
             <h1>🔧 Salesforce AI Agent Configuration</h1>
             <p style="font-size: 1.1rem; opacity: 0.9;">Please provide your API credentials to get started</p>
         </div>
     </div>
-    """, unsafe_allow_html=True)
+    """
+
+# App name/version never change at runtime, so the footer is formatted once
+_CONFIG_FOOTER_HTML = f"""
+<div style="text-align: center; margin-top: 2rem; padding-top: 1rem; border-top: 1px solid #eee;">
+    <small style="color: #666;">
+        {Config.APP_NAME} v{Config.APP_VERSION}
+    </small>
+</div>
+"""
+
+# Credential setup walkthrough, rendered only on request
+_SETUP_INSTRUCTIONS = """
+**OpenAI API Key:**
+1. Go to [OpenAI Platform](https://platform.openai.com/api-keys)
+2. Create a new API key
+3. Copy and paste it above
+
+**Salesforce Connected App:**
+1. In Salesforce: Setup → App Manager → New Connected App
+2. Basic Information: Fill app name, email, etc.
+3. API (Enable OAuth Settings):
+   - ✅ Enable OAuth Settings
+   - ✅ Enable Client Credentials Flow
+   - Callback URL: `http://localhost` (not used)
+   - Scopes: `api`, `refresh_token`, `web`
+4. Save and get Client ID & Secret
+"""
+
+def show_configuration_popup():
+    """Show configuration popup to collect API keys and Salesforce credentials."""
+    # Custom CSS and header for the configuration page
+    st.markdown(_CONFIG_CSS, unsafe_allow_html=True)
+    st.markdown(_CONFIG_HEADER_HTML, unsafe_allow_html=True)
     
     with st.container():
         col1, col2, col3 = st.columns([1, 2, 1])
@@ -1634,6 +1954,11 @@ def show_configuration_popup():
             else:
                 st.warning("⚠️ Using Username-Password Flow - requires 6 fields")
             
+            # Outside the form so toggling takes effect immediately; when off,
+            # the instructions are not sent to the browser at all
+            if st.toggle("📚 Show Setup Instructions", key="show_setup_instructions"):
+                st.markdown(_SETUP_INSTRUCTIONS)
+            
             with st.form("config_form"):
                 col_a, col_b = st.columns(2)
                 with col_a:
@@ -1694,34 +2019,10 @@ def show_configuration_popup():
                 
                 st.markdown("---")
                 
-                with st.expander("📚 Setup Instructions", expanded=False):
-                    st.markdown("""
-                    **OpenAI API Key:**
-                    1. Go to [OpenAI Platform](https://platform.openai.com/api-keys)
-                    2. Create a new API key
-                    3. Copy and paste it above
-                    
-                    **Salesforce Connected App:**
-                    1. In Salesforce: Setup → App Manager → New Connected App
-                    2. Basic Information: Fill app name, email, etc.
-                    3. API (Enable OAuth Settings):
-                       - ✅ Enable OAuth Settings
-                       - ✅ Enable Client Credentials Flow
-                       - Callback URL: `http://localhost` (not used)
-                       - Scopes: `api`, `refresh_token`, `web`
-                    4. Save and get Client ID & Secret
-                    """)
-                
                 submitted = st.form_submit_button("🚀 Connect & Validate", use_container_width=True, type="primary")
                 
                 # App information footer
-                st.markdown(f"""
-                <div style="text-align: center; margin-top: 2rem; padding-top: 1rem; border-top: 1px solid #eee;">
-                    <small style="color: #666;">
-                        {Config.APP_NAME} v{Config.APP_VERSION}
-                    </small>
-                </div>
-                """, unsafe_allow_html=True)
+                st.markdown(_CONFIG_FOOTER_HTML, unsafe_allow_html=True)
                 
                 if submitted:
                     return validate_and_save_config(
@@ -1736,13 +2037,44 @@ def validate_and_save_config(openai_key, sf_instance, sf_client_id, sf_client_se
                            use_client_creds, sf_username, sf_password, sf_security_token):
     """Validate the provided configuration and save if successful with improved error handling."""
     
+    # Catch blank fields before any network call is made
+    required_fields = [
+        ("OpenAI API Key", openai_key),
+        ("Instance URL", sf_instance),
+        ("Client ID", sf_client_id),
+        ("Client Secret", sf_client_secret)
+    ]
+    if not use_client_creds:
+        required_fields += [
+            ("Username", sf_username),
+            ("Password", sf_password),
+            ("Security Token", sf_security_token)
+        ]
+    missing_fields = [name for name, value in required_fields if not value]
+    if missing_fields:
+        st.error(f"❌ Missing required fields: {', '.join(missing_fields)}")
+        return False
+    
     validation_errors = []
     
     with st.spinner("🔍 Validating configurations..."):
+        # The two checks are independent network calls, so run them side by side;
+        # results are rendered here because workers have no script context
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            openai_future = executor.submit(validate_openai_config, openai_key)
+            sf_future = executor.submit(
+                validate_salesforce_config,
+                sf_instance, sf_client_id, sf_client_secret, sf_domain,
+                use_client_creds, sf_username, sf_password, sf_security_token
+            )
+        
         # Validate OpenAI
         try:
-            openai_valid = validate_openai_config(openai_key)
-            if not openai_valid:
+            openai_valid, openai_message = openai_future.result()
+            if openai_valid:
+                st.success(openai_message)
+            else:
+                st.error(openai_message)
                 validation_errors.append("OpenAI API key validation failed")
         except Exception as e:
             error_response = error_handler.handle_error(e, "OpenAI validation")
@@ -1751,11 +2083,11 @@ def validate_and_save_config(openai_key, sf_instance, sf_client_id, sf_client_se
         
         # Validate Salesforce
         try:
-            sf_valid = validate_salesforce_config(
-                sf_instance, sf_client_id, sf_client_secret, sf_domain,
-                use_client_creds, sf_username, sf_password, sf_security_token
-            )
-            if not sf_valid:
+            sf_valid, sf_message = sf_future.result()
+            if sf_valid:
+                st.success(sf_message)
+            else:
+                st.error(sf_message)
                 validation_errors.append("Salesforce configuration validation failed")
         except Exception as e:
             error_response = error_handler.handle_error(e, "Salesforce validation")
@@ -1779,6 +2111,8 @@ def validate_and_save_config(openai_key, sf_instance, sf_client_id, sf_client_se
             st.session_state.sf_password = sf_password
             st.session_state.sf_security_token = sf_security_token
             st.session_state.config_complete = True
+            # A connection test result describes the previous credentials
+            st.session_state.pop('sf_connection_result', None)
             
             st.success("✅ All configurations validated successfully!")
             st.balloons()
@@ -1801,32 +2135,28 @@ def validate_configuration_at_startup():
     
     if hasattr(st.session_state, 'validation_cache') and cache_key in st.session_state.validation_cache:
         cached_result = st.session_state.validation_cache[cache_key]
-        # Check if cache is still valid (less than 5 minutes old)
-        if (datetime.now() - datetime.fromisoformat(cached_result['timestamp'])).seconds < 300:
+        # Check if cache is still valid (less than 5 minutes old); the epoch is
+        # stored alongside the ISO timestamp so no parse is needed per check
+        if time.monotonic() - cached_result.get('checked_at', float('-inf')) < 300:
             return cached_result['errors']
     
     validation_errors = []
     
     # Validate OpenAI configuration
-    try:
-        import openai
-        if hasattr(st.session_state, 'openai_api_key') and st.session_state.openai_api_key:
-            # Test OpenAI connection with a simple call
-            try:
-                client = openai.OpenAI(api_key=st.session_state.openai_api_key)
-                # Make a minimal test call with timeout
-                response = client.models.list()
-                logging.info("✅ OpenAI API validation successful")
-            except openai.AuthenticationError:
-                validation_errors.append("OpenAI API key is invalid")
-            except openai.RateLimitError:
-                validation_errors.append("OpenAI API rate limit exceeded")
-            except Exception as e:
-                validation_errors.append(f"OpenAI API validation failed: {str(e)}")
-        else:
-            validation_errors.append("OpenAI API key not configured")
-    except ImportError:
-        validation_errors.append("OpenAI library not installed")
+    if hasattr(st.session_state, 'openai_api_key') and st.session_state.openai_api_key:
+        # Test OpenAI connection with a simple call
+        try:
+            # Reuses the client verified on an earlier run while it is cached
+            _verified_openai_client(st.session_state.openai_api_key)
+            logging.info("✅ OpenAI API validation successful")
+        except openai.AuthenticationError:
+            validation_errors.append("OpenAI API key is invalid")
+        except openai.RateLimitError:
+            validation_errors.append("OpenAI API rate limit exceeded")
+        except Exception as e:
+            validation_errors.append(f"OpenAI API validation failed: {str(e)}")
+    else:
+        validation_errors.append("OpenAI API key not configured")
     
     # Validate Salesforce configuration
     try:
@@ -1855,7 +2185,8 @@ def validate_configuration_at_startup():
     
     st.session_state.validation_cache[cache_key] = {
         'errors': validation_errors,
-        'timestamp': datetime.now().isoformat()
+        'timestamp': datetime.now().isoformat(),
+        'checked_at': time.monotonic()
     }
     
     return validation_errors
@@ -1880,11 +2211,15 @@ def display_startup_validation_results(validation_errors):
             st.success("✅ All systems validated successfully")
 
 def _validate_env_config():
-    """Validate environment variables for test mode."""
-    from config import Config
+    """Validate environment variables for test mode (once per session)."""
+    # The environment cannot change mid-session, so reuse the first answer
+    env_valid = st.session_state.get('_env_valid')
+    if env_valid is not None:
+        return env_valid
     
     # Check OpenAI key
     if not Config.OPENAI_API_KEY:
+        st.session_state._env_valid = False
         return False
     
     # Check Salesforce config (either Client Credentials or Username-Password)
@@ -1903,11 +2238,13 @@ def _validate_env_config():
         Config.SALESFORCE_SECURITY_TOKEN
     ])
     
-    return has_client_creds or has_username_password
+    st.session_state._env_valid = has_client_creds or has_username_password
+    return st.session_state._env_valid
 
 def _load_config_from_env():
-    """Load configuration from environment variables into session state."""
-    from config import Config
+    """Load configuration from environment variables into session state (once per session)."""
+    if st.session_state.get('_env_loaded'):
+        return
     
     # Load from environment
     st.session_state.openai_api_key = Config.OPENAI_API_KEY
@@ -1918,130 +2255,190 @@ def _load_config_from_env():
     st.session_state.sf_username = Config.SALESFORCE_USERNAME or ""
     st.session_state.sf_password = Config.SALESFORCE_PASSWORD or ""
     st.session_state.sf_security_token = Config.SALESFORCE_SECURITY_TOKEN or ""
+    st.session_state._env_loaded = True
+
+@st.cache_resource(ttl=3600, max_entries=4, show_spinner=False)
+def _verified_openai_client(api_key: str):
+    """
+    Build an OpenAI client and prove the key with a models listing.
+    Failures raise and are therefore never cached.
+    """
+    client = openai.OpenAI(api_key=api_key)
+    client.models.list()
+    return client
+
+@st.cache_resource(show_spinner=False)
+def _salesforce_http_session():
+    """
+    Shared keep-alive session for the Salesforce validation calls, so the
+    token request and the follow-up probes reuse one TLS connection.
+    """
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=4,
+        max_retries=Retry(total=2, backoff_factor=0.3)
+    ))
+    return session
+
+class SalesforceTokenCache:
+    """
+    Salesforce OAuth token payloads keyed by (token URL, credentials).
+    Entries expire on their own lifetime and are dropped one at a time, so
+    one user's failure never evicts another user's token.
+    """
+    
+    def __init__(self):
+        self._tokens: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key: tuple) -> Optional[Dict[str, Any]]:
+        """Get a cached token payload, or None if missing or expired."""
+        with self._lock:
+            entry = self._tokens.get(key)
+            if entry is None:
+                return None
+            token_data, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._tokens[key]
+                return None
+            return token_data
+    
+    def put(self, key: tuple, token_data: Dict[str, Any]):
+        """Cache a token payload for its expires_in, or the fallback lifetime."""
+        lifetime = float(token_data.get('expires_in') or SF_TOKEN_FALLBACK_TTL_SECONDS)
+        with self._lock:
+            self._tokens[key] = (token_data, time.monotonic() + lifetime)
+    
+    def invalidate(self, key: tuple):
+        """Drop a single cached token."""
+        with self._lock:
+            self._tokens.pop(key, None)
+
+@st.cache_resource(show_spinner=False)
+def _salesforce_token_cache() -> SalesforceTokenCache:
+    """Process-wide Salesforce token cache."""
+    return SalesforceTokenCache()
+
+def _salesforce_token(auth_url: str, auth_items: tuple, refresh: bool = False) -> Dict[str, Any]:
+    """
+    Get a Salesforce token payload for the credentials, reusing a cached one
+    unless refresh is set. Rejected credentials raise AuthenticationError.
+    """
+    cache = _salesforce_token_cache()
+    key = (auth_url, auth_items)
+    if not refresh:
+        token_data = cache.get(key)
+        if token_data is not None:
+            return token_data
+    
+    response = _salesforce_http_session().post(auth_url, data=dict(auth_items), timeout=30)
+    
+    if response.status_code != 200:
+        cache.invalidate(key)
+        error_data = response.json() if response.headers.get('content-type') == 'application/json' else {}
+        raise AuthenticationError(error_data.get('error_description', error_data.get('error', response.text)))
+    
+    token_data = response.json()
+    cache.put(key, token_data)
+    return token_data
+
+def _query_org_info(token_data: Dict[str, Any], instance_url: str):
+    """Query the Organization record; doubles as the API access check."""
+    # For username-password flow, use the returned instance URL
+    test_instance_url = token_data.get('instance_url', instance_url)
+    return _salesforce_http_session().get(
+        f"{test_instance_url}/services/data/v58.0/query",
+        headers={'Authorization': f"Bearer {token_data['access_token']}"},
+        params={'q': "SELECT Id, Name, OrganizationType FROM Organization LIMIT 1"},
+        timeout=30
+    )
 
 def validate_openai_config(api_key):
-    """Validate OpenAI API key."""
+    """
+    Validate OpenAI API key.
+    Returns (is_valid, message); safe to run off the script thread.
+    """
     if not api_key:
-        st.error("OpenAI API key is required")
-        return False
+        return False, "OpenAI API key is required"
     
     try:
-        import openai
-        client = openai.OpenAI(api_key=api_key)
-        
-        # Test with a simple API call
-        response = client.models.list()
-        st.success("✅ OpenAI API key is valid")
-        return True
+        _verified_openai_client(api_key)
+        return True, "✅ OpenAI API key is valid"
     except Exception as e:
-        st.error(f"❌ OpenAI validation failed: {str(e)}")
-        return False
+        return False, f"❌ OpenAI validation failed: {str(e)}"
+
+# Salesforce login domain -> OAuth token endpoint
+_SF_TOKEN_URLS = {
+    "login": "https://login.salesforce.com/services/oauth2/token",
+    "test": "https://test.salesforce.com/services/oauth2/token"
+}
 
 def validate_salesforce_config(instance_url, client_id, client_secret, domain, 
                              use_client_creds, username, password, security_token):
-    """Validate Salesforce configuration using direct API call."""
+    """
+    Validate Salesforce configuration using direct API call.
+    Returns (is_valid, message); safe to run off the script thread.
+    """
     
     # Check required fields based on auth method
     if use_client_creds:
         if not all([instance_url, client_id, client_secret]):
-            st.error("Instance URL, Client ID, and Client Secret are required for Client Credentials Flow")
-            return False
+            return False, "Instance URL, Client ID, and Client Secret are required for Client Credentials Flow"
     else:
         if not all([instance_url, client_id, client_secret, username, password, security_token]):
-            st.error("All fields are required for Username-Password Flow")
-            return False
+            return False, "All fields are required for Username-Password Flow"
     
     try:
-        import requests
-        
-        # Determine auth URL based on domain
-        if domain == "test":
-            auth_base_url = "https://test.salesforce.com"
-        else:
-            auth_base_url = "https://login.salesforce.com"
-        
-        auth_url = f"{auth_base_url}/services/oauth2/token"
-        
-        # Choose authentication method
-        if use_client_creds:
-            # Test Client Credentials Flow
-            auth_data = {
-                'grant_type': 'client_credentials',
-                'client_id': client_id,
-                'client_secret': client_secret
-            }
-            auth_method_name = "Client Credentials"
-        else:
-            # Test Username-Password Flow
-            auth_data = {
-                'grant_type': 'password',
-                'client_id': client_id,
-                'client_secret': client_secret,
-                'username': username,
-                'password': password + security_token
-            }
-            auth_method_name = "Username-Password"
-        
-        # Make authentication request
-        response = requests.post(auth_url, data=auth_data, timeout=30)
+        # Determine auth URL based on domain (anything but sandbox logs in to production)
+        auth_url = _SF_TOKEN_URLS.get(domain, _SF_TOKEN_URLS["login"])
+        
+        # Choose authentication method: Client Credentials or Username-Password Flow
+        auth_data = {
+            'grant_type': 'client_credentials',
+            'client_id': client_id,
+            'client_secret': client_secret
+        } if use_client_creds else {
+            'grant_type': 'password',
+            'client_id': client_id,
+            'client_secret': client_secret,
+            'username': username,
+            'password': password + security_token
+        }
+        auth_method_name = "Client Credentials" if use_client_creds else "Username-Password"
         
-        if response.status_code == 200:
-            token_data = response.json()
-            access_token = token_data['access_token']
-            
-            # For username-password flow, use the returned instance URL
-            test_instance_url = token_data.get('instance_url', instance_url)
-            
-            # Test API access with the token
-            api_url = f"{test_instance_url}/services/data/v58.0/sobjects"
-            headers = {'Authorization': f'Bearer {access_token}'}
-            
-            api_response = requests.get(api_url, headers=headers, timeout=30)
-            
-            if api_response.status_code == 200:
-                # Get org info
-                org_query_url = f"{test_instance_url}/services/data/v58.0/query"
-                org_query = "SELECT Id, Name, OrganizationType FROM Organization LIMIT 1"
-                org_response = requests.get(
-                    org_query_url, 
-                    headers=headers, 
-                    params={'q': org_query},
-                    timeout=30
-                )
-                
-                if org_response.status_code == 200:
-                    org_data = org_response.json()
-                    if org_data.get('records'):
-                        org_name = org_data['records'][0].get('Name', 'Unknown')
-                        st.success(f"✅ Connected to Salesforce org: {org_name} (using {auth_method_name} Flow)")
-                    else:
-                        st.success(f"✅ Connected to Salesforce (using {auth_method_name} Flow)")
-                    return True
-                else:
-                    st.error("❌ Connected but unable to query org information")
-                    return False
-            else:
-                st.error(f"❌ API access failed: {api_response.status_code}")
-                return False
-        else:
-            error_data = response.json() if response.headers.get('content-type') == 'application/json' else {}
-            error_msg = error_data.get('error_description', error_data.get('error', response.text))
-            
+        # Make authentication request (a token issued for the same credentials is reused)
+        token_key = (auth_url, tuple(sorted(auth_data.items())))
+        try:
+            token_data = _salesforce_token(*token_key)
+            org_response = _query_org_info(token_data, instance_url)
+            if org_response.status_code == 401:
+                # The cached token expired or was revoked: get a fresh one and retry once
+                token_data = _salesforce_token(*token_key, refresh=True)
+                org_response = _query_org_info(token_data, instance_url)
+        except AuthenticationError as e:
+            error_msg = str(e)
             if use_client_creds and "not supported" in error_msg.lower():
-                st.error("❌ Client Credentials Flow is not enabled on your Connected App. Please enable it or use Username-Password Flow.")
-            else:
-                st.error(f"❌ {auth_method_name} authentication failed: {error_msg}")
-            return False
+                return False, "❌ Client Credentials Flow is not enabled on your Connected App. Please enable it or use Username-Password Flow."
+            return False, f"❌ {auth_method_name} authentication failed: {error_msg}"
+        
+        if org_response.status_code == 200:
+            org_data = org_response.json()
+            if org_data.get('records'):
+                org_name = org_data['records'][0].get('Name', 'Unknown')
+                return True, f"✅ Connected to Salesforce org: {org_name} (using {auth_method_name} Flow)"
+            return True, f"✅ Connected to Salesforce (using {auth_method_name} Flow)"
+        
+        # Don't keep a token that cannot reach the API
+        _salesforce_token_cache().invalidate(token_key)
+        return False, f"❌ API access failed: {org_response.status_code}"
             
     except requests.exceptions.Timeout:
-        st.error("❌ Connection timeout - please check your network and Salesforce instance URL")
-        return False
+        return False, "❌ Connection timeout - please check your network and Salesforce instance URL"
     except requests.exceptions.ConnectionError:
-        st.error("❌ Connection error - please check your network and Salesforce instance URL")
-        return False
+        return False, "❌ Connection error - please check your network and Salesforce instance URL"
     except Exception as e:
-        st.error(f"❌ Salesforce validation failed: {str(e)}")
-        return False
+        return False, f"❌ Salesforce validation failed: {str(e)}"
 
 def make_json_serializable(obj):
     """
@@ -2080,33 +2477,74 @@ def make_json_serializable(obj):
         # Fallback: convert to string
         return str(obj)
 
-def safe_json_serialize(data):
+def safe_json_serialize(data, **dumps_kwargs):
     """
     Safely serialize data to JSON, handling CrewOutput and other non-serializable objects.
+    Extra keyword arguments are passed to json.dumps (default: indent=2).
     """
+    dumps_kwargs = dumps_kwargs or {"indent": 2}
     try:
         # First try normal JSON serialization
-        return json.dumps(data, indent=2)
+        return json.dumps(data, **dumps_kwargs)
     except TypeError:
         # If that fails, convert to serializable format first
         serializable_data = make_json_serializable(data)
-        return json.dumps(serializable_data, indent=2)
+        return json.dumps(serializable_data, **dumps_kwargs)
 
-def display_real_time_agent_activity():
-    """Display real-time agent activity in an expandable section within chat."""
-    
-    # Only show if agents are processing
-    if not st.session_state.processing:
-        return
-    
+# Download payloads are compact UTF-8; pretty-printing roughly doubles their size
+_EXPORT_JSON_OPTIONS = {"separators": (",", ":"), "ensure_ascii": False}
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _cached_conversation_json(session_id, message_count, last_timestamp, _history) -> bytes:
+    """Serialize a conversation; only the leading key arguments are hashed."""
+    # Underscore-prefixed keys are render caches and are left out of the export
+    return safe_json_serialize([
+        {key: value for key, value in message.items() if not key.startswith('_')}
+        if isinstance(message, dict) else message
+        for message in _history
+    ], **_EXPORT_JSON_OPTIONS).encode("utf-8")
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _cached_plan_json(session_id, plan_id, _plan) -> bytes:
+    """Serialize an implementation plan; only the leading key arguments are hashed."""
+    return safe_json_serialize(_plan, **_EXPORT_JSON_OPTIONS).encode("utf-8")
+
+def _with_archived_messages(archived, history):
+    """
+    Prepend archived messages to the UI history for export. The two can
+    overlap (the UI keeps more messages than the agent memory), so the
+    longest run of archived messages that the history starts with is
+    dropped. Messages are compared by (role, content) only: the memory
+    stamps its own timestamps, which never match the UI's.
+    """
+    def key(message):
+        return (message.get('role'), message.get('content'))
+    
+    history_keys = [key(message) for message in history]
+    for overlap in range(min(len(archived), len(history)), 0, -1):
+        if [key(message) for message in archived[-overlap:]] == history_keys[:overlap]:
+            return [*archived[:-overlap], *history]
+    return [*archived, *history]
+
+def get_conversation_export(session_id, history):
+    """Get the download payload for a conversation, reusing it until the history grows."""
+    last_timestamp = history[-1].get('timestamp') if history else None
+    return _cached_conversation_json(session_id, len(history), last_timestamp, history)
+
+def get_plan_export(session_id, plan):
+    """Get the download payload for an implementation plan."""
+    return _cached_plan_json(session_id, id(plan), plan)
+
+def _real_time_agent_activity_body():
+    """Render the live agent activity expander."""
     # Create expandable section for agent activity
     with st.expander("🔍 **Live Agent Activity** (Click to see what's happening behind the scenes)", expanded=False):
         
         # Show current active agent
         if 'current_active_agent' in st.session_state and st.session_state.current_active_agent:
             agent = st.session_state.current_active_agent
-            start_time = st.session_state.get('agent_start_time', time.time())
-            elapsed = time.time() - start_time
+            start_time = st.session_state.get('agent_start_time', time.monotonic())
+            elapsed = time.monotonic() - start_time
             
             # Get agent details
             agent_details = {
@@ -2145,9 +2583,9 @@ def display_real_time_agent_activity():
             st.progress(progress, text=f"Progress: {progress*100:.1f}%")
             
             # Show memory operations if available
-            if 'agent_activities' in st.session_state:
+            if 'active_activities' in st.session_state:
                 st.markdown("**📊 Recent Activities:**")
-                for activity in st.session_state.agent_activities[-3:]:  # Show last 3 activities
+                for activity in get_recent_agent_activities(3):  # Show last 3 activities
                     if activity.get('status') == 'completed':
                         duration = activity.get('duration', 0)
                         st.markdown(f"✅ **{activity['agent']}** completed in {duration:.1f}s")
@@ -2186,17 +2624,239 @@ def display_real_time_agent_activity():
                 <span style="color: {status_color}; font-weight: 500;">{agent_info['name']}</span>
             </div>
             """, unsafe_allow_html=True)
-        
-        # Auto-refresh while processing
-        if st.session_state.processing:
-            time.sleep(1)
-            st.rerun()
+
+@st.fragment(run_every=ACTIVITY_REFRESH_SECONDS)
+def _real_time_agent_activity_fragment():
+    """Re-render only the live activity expander on a timer while agents are working."""
+    if not st.session_state.processing:
+        return
+    _real_time_agent_activity_body()
+
+def display_real_time_agent_activity():
+    """Display real-time agent activity in an expandable section within chat."""
+    
+    # Only show if agents are processing
+    if not st.session_state.processing:
+        return
+    
+    _real_time_agent_activity_fragment()
+
+class StreamBuffer:
+    """
+    Thread-safe accumulator for streamed agent output.
+    Producers append deltas from any thread without touching session state;
+    the UI reads a snapshot at most once per flush interval.
+    """
+    
+    def __init__(self, min_interval: float = STREAM_FLUSH_SECONDS):
+        self.min_interval = min_interval
+        self._parts: List[str] = []
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_flush = 0.0
+    
+    def write(self, delta: str):
+        """Append a chunk of streamed text."""
+        with self._lock:
+            self._parts.append(delta)
+            self._dirty = True
+    
+    def has_output(self) -> bool:
+        """Whether anything has been streamed yet."""
+        with self._lock:
+            return bool(self._parts)
+    
+    def getvalue(self) -> str:
+        """Get everything streamed so far."""
+        with self._lock:
+            return "".join(self._parts)
+    
+    def flush(self) -> Optional[str]:
+        """Get the streamed text if it changed and the flush interval has elapsed, else None."""
+        now = time.monotonic()
+        with self._lock:
+            if not self._dirty or now - self._last_flush < self.min_interval:
+                return None
+            self._dirty = False
+            self._last_flush = now
+            return "".join(self._parts)
+
+@st.cache_resource
+def _get_agent_executor() -> ThreadPoolExecutor:
+    """
+    Shared worker pool for blocking agent calls, created once per server process.
+    At most Config.AGENT_MAX_WORKERS replies (across all users) run concurrently.
+    """
+    return ThreadPoolExecutor(max_workers=Config.AGENT_MAX_WORKERS, thread_name_prefix="agent")
+
+def submit_agent_request(user_input: str):
+    """Show the user's message right away and process it in the background."""
+    # Optimistic update: the bubble is drawn now and confirmed when the reply lands
+    user_message = _new_message('user', user_input, 'user_input', _pending=True)
+    _append_message(user_message)
+    st.session_state.pending_message = user_message
+    
+    # Sink for streamed output; agent steps are buffered here instead of each triggering a rerun
+    stream_buffer = st.session_state.stream_buffer = StreamBuffer()
+    st.session_state.last_stream_flush = ""
+    
+    st.session_state.pending_reply = _get_agent_executor().submit(
+        st.session_state.unified_agent.process_user_input, user_input, stream_callback=stream_buffer.write
+    )
+    st.session_state.processing = True
+
+def collect_agent_reply():
+    """Append the agent's reply to the conversation once the background call has finished."""
+    future = st.session_state.pending_reply
+    if future is None or not future.done():
+        return
+    
+    user_message = st.session_state.pending_message
+    st.session_state.pending_reply = None
+    st.session_state.pending_message = None
+    st.session_state.stream_buffer = None
+    st.session_state.last_stream_flush = ""
+    st.session_state.processing = False
+    
+    if user_message is not None:
+        user_message.pop('_pending', None)
+    
+    try:
+        result = future.result()
+    except Exception as e:
+        # Stop any agents still shown as working and answer in the chat
+        complete_all_agent_activities()
+        _append_message(
+            _new_message('agent', f"Sorry, I encountered an error: {str(e)}", 'error')
+        )
+        return
+    
+    if result.get('success'):
+        if result.get('response'):
+            _append_message(
+                _new_message('agent', result['response'], 'agent_response')
+            )
+    else:
+        _append_message(
+            _new_message('agent', f"Sorry, I encountered an error: {result.get('error', 'Unknown error')}", 'error')
+        )
+
+def _render_pending_indicator():
+    """Show that agents are still working on the last message."""
+    buffer = st.session_state.stream_buffer
+    streamed_text = buffer.flush() if buffer else None
+    if streamed_text is not None:
+        st.session_state.last_stream_flush = streamed_text
+    
+    # The label follows the orchestrator's state, so each poll shows the stage
+    # the pipeline has reached while the call is still running
+    status_label = get_agent_status_display() or "🤖 Agents are working on your request..."
+    streamed = st.session_state.get('last_stream_flush')
+    with st.status(status_label, expanded=bool(streamed), state="running"):
+        if streamed:
+            _render_messages([{
+                'role': 'agent',
+                'content': streamed,
+                '_streaming': True
+            }])
+
+def _is_streaming() -> bool:
+    """Whether the pending reply has started streaming output."""
+    buffer = st.session_state.stream_buffer
+    return buffer is not None and buffer.has_output()
+
+@st.fragment(run_every=REPLY_POLL_SECONDS)
+def _pending_reply_fragment():
+    """Poll the background agent call until it completes or starts streaming."""
+    future = st.session_state.pending_reply
+    if future is None:
+        return
+    if future.done() or _is_streaming():
+        # Finished, or output arrived: a full rerun collects the reply or
+        # switches to the faster streaming fragment
+        st.rerun()
+    _render_pending_indicator()
+
+@st.fragment(run_every=STREAM_FLUSH_SECONDS)
+def _streaming_reply_fragment():
+    """Show streamed output at the flush rate and rerun the app once the call completes."""
+    future = st.session_state.pending_reply
+    if future is None:
+        return
+    if future.done():
+        st.rerun()
+    _render_pending_indicator()
+
+def display_pending_reply():
+    """Keep the UI live while an agent reply is being computed."""
+    if st.session_state.pending_reply is None:
+        return
+    
+    # Slow polling while nothing is streamed; once output flows, refresh at
+    # STREAM_FLUSH_SECONDS so the buffer's throttle is what limits updates
+    if _is_streaming():
+        _streaming_reply_fragment()
+    else:
+        _pending_reply_fragment()
+
+def _on_chat_submit():
+    """Form callback: queue the submitted message before the script reruns."""
+    user_input = st.session_state.chat_input
+    if not user_input.strip():
+        return
+    if st.session_state.pending_reply is not None:
+        st.toast("Please wait for the agents to finish the current request.", icon="⏳")
+        return
+    
+    # Add user message immediately and process with agent in the background
+    submit_agent_request(user_input)
+
+@contextmanager
+def _timed(section: str):
+    """Record how long a section of the script run took (shown by the rerun profiler)."""
+    if not Config.PROFILE_RERUNS:
+        yield
+        return
+    
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = st.session_state.get('profile_timings')
+        if timings is None:
+            timings = st.session_state['profile_timings'] = deque(maxlen=PROFILE_HISTORY_SIZE)
+        timings.append((section, time.perf_counter() - start))
+
+def display_profiler():
+    """Show per-section timings of recent script runs in the sidebar (PROFILE_RERUNS only)."""
+    if not Config.PROFILE_RERUNS or not st.sidebar.checkbox("🔬 Profile reruns", key="show_profiler"):
+        return
+    
+    stats: Dict[str, List[float]] = {}
+    for section, seconds in st.session_state.get('profile_timings', ()):
+        stats.setdefault(section, []).append(seconds)
+    
+    st.sidebar.table([
+        {
+            "section": section,
+            "runs": len(samples),
+            "last ms": round(samples[-1] * 1000, 1),
+            "mean ms": round(sum(samples) / len(samples) * 1000, 1),
+            "max ms": round(max(samples) * 1000, 1)
+        }
+        for section, samples in stats.items()
+    ])
 
 def main():
     """Main application function with simple chat interface."""
     
+    # Inject the cached app stylesheet
+    with _timed("inject_css"):
+        st.markdown(_css(), unsafe_allow_html=True)
+    
     # Initialize session state
-    initialize_session_state()
+    with _timed("initialize_session_state"):
+        initialize_session_state()
     
     # Initialize unified agent system if needed
     if not st.session_state.unified_agent:
@@ -2209,97 +2869,34 @@ def main():
             st.error(f"Agent initialization error: {str(e)}")
             return
     
-    # Display sidebar
-    display_sidebar()
-    
-    # Simple CSS for the chat
-    st.markdown("""
-    <style>
-    .main .block-container {
-        padding-top: 1rem !important;
-        max-width: 800px !important;
-        padding-bottom: 100px !important;
-    }
+    # Pick up a finished background reply before anything is rendered
+    with _timed("collect_agent_reply"):
+        collect_agent_reply()
     
-    .chat-input-container {
-        position: fixed;
-        bottom: 0;
-        left: 0;
-        right: 0;
-        background: white;
-        padding: 20px;
-        border-top: 1px solid #ddd;
-        z-index: 1000;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    # Display sidebar
+    with _timed("display_sidebar"):
+        display_sidebar()
     
     # Display conversation history
-    if st.session_state.conversation_history:
-        for message in st.session_state.conversation_history:
-            if message['role'] == 'user':
-                # User message - right aligned, blue
-                st.markdown(f'''
-                    <div style="display: flex; justify-content: flex-end; margin: 10px 0;">
-                        <div style="background: #007bff; color: white; padding: 10px 15px; border-radius: 15px; max-width: 70%; word-wrap: break-word;">
-                            {message['content']}
-                        </div>
-                    </div>
-                ''', unsafe_allow_html=True)
-            else:
-                # Agent message - left aligned, gray
-                st.markdown(f'''
-                    <div style="display: flex; justify-content: flex-start; margin: 10px 0;">
-                        <div style="background: #f1f3f4; color: #333; padding: 10px 15px; border-radius: 15px; max-width: 70%; word-wrap: break-word;">
-                            🤖 {message['content']}
-                        </div>
-                    </div>
-                ''', unsafe_allow_html=True)
-    else:
-        st.markdown('<div style="text-align: center; color: #666; margin: 50px 0;">💬 Start a conversation by typing below</div>', unsafe_allow_html=True)
-    
-    # Fixed input at bottom
-    st.markdown('<div style="height: 100px;"></div>', unsafe_allow_html=True)  # Spacer
+    with _timed("display_conversation_history"):
+        display_conversation_history()
     
-    # Create input container
+    # Create input container (spaced from the history by the stylesheet)
     input_container = st.container()
     with input_container:
         with st.form("chat_form", clear_on_submit=True):
             col1, col2 = st.columns([4, 1])
             with col1:
-                user_input = st.text_input("Your message", placeholder="Type your Salesforce requirement here...", label_visibility="collapsed")
+                st.text_input("Your message", placeholder="Type your Salesforce requirement here...", label_visibility="collapsed", key="chat_input")
             with col2:
-                send_button = st.form_submit_button("Send")
-            
-            if send_button and user_input.strip():
-                # Add user message immediately
-                st.session_state.conversation_history.append({
-                    'role': 'user',
-                    'content': user_input,
-                    'timestamp': datetime.now().isoformat(),
-                    'message_type': 'user_input'
-                })
-                
-                # Process with agent
-                try:
-                    result = st.session_state.unified_agent.process_user_input(user_input)
-                    if result.get('success') and result.get('response'):
-                        st.session_state.conversation_history.append({
-                            'role': 'agent',
-                            'content': result['response'],
-                            'timestamp': datetime.now().isoformat(),
-                            'message_type': 'agent_response'
-                        })
-                except Exception as e:
-                    st.session_state.conversation_history.append({
-                        'role': 'agent',
-                        'content': f"Sorry, I encountered an error: {str(e)}",
-                        'timestamp': datetime.now().isoformat(),
-                        'message_type': 'error'
-                    })
-                
-                # Refresh to show new messages
-                st.rerun()
+                # The callback runs before the form's own rerun, so no extra st.rerun() is needed
+                st.form_submit_button("Send", on_click=_on_chat_submit)
+    
+    # Debug-only timing table for the sections above
+    display_profiler()
+    
+    # Poll for the agent reply while it is being processed
+    display_pending_reply()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
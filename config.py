@@ -28,6 +28,8 @@ class Config:
     # Application Configuration
     DEBUG: bool = os.getenv("DEBUG", "True").lower() == "true"
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    # Opt-in sidebar table of per-section render timings (off by default)
+    PROFILE_RERUNS: bool = os.getenv("PROFILE_RERUNS", "False").lower() == "true"
     
     # Application Metadata
     APP_NAME: str = "Salesforce AI Agent System"
@@ -44,6 +46,11 @@ class Config:
     # Memory and Storage
     CONVERSATION_HISTORY_PATH: str = "data/conversation_history"
     PLANS_STORAGE_PATH: str = "data/implementation_plans"
+    # Most chat messages kept in the UI session; older ones stay in agent memory/archive
+    MAX_UI_HISTORY: int = int(os.getenv("MAX_UI_HISTORY", "200"))
+    # Agent replies run on one worker pool shared by every browser session; this caps
+    # how many run at once, and requests beyond it wait for a free worker
+    AGENT_MAX_WORKERS: int = int(os.getenv("AGENT_MAX_WORKERS", "16"))
     
     # Salesforce Connection Settings
     SALESFORCE_CONNECTION_TIMEOUT: int = int(os.getenv("SALESFORCE_CONNECTION_TIMEOUT", "30"))
@@ -29,7 +29,7 @@ setup(
     ],
     python_requires=">=3.8",
     install_requires=[
-        "streamlit==1.28.0",
+        "streamlit==1.37.0",
         "python-dotenv==1.0.0",
         "requests>=2.31.0",
         "simple-salesforce>=1.12.0",
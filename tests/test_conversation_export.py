@@ -0,0 +1,39 @@
+"""Tests for merging archived messages into the conversation export in app.py."""
+
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("crewai")
+
+from app import _with_archived_messages
+
+
+def _msg(role, content, timestamp):
+    return {"role": role, "content": content, "timestamp": timestamp}
+
+
+def test_overlapping_archive_and_history_are_merged_once():
+    archived = [
+        _msg("user", "Build a case escalation flow", "2024-01-01T10:00:00.000001"),
+        _msg("agent", "Which objects are involved?", "2024-01-01T10:00:05.000002"),
+        _msg("user", "Case and Account", "2024-01-01T10:01:00.000003"),
+    ]
+    history = [
+        _msg("agent", "Which objects are involved?", "2024-01-01T10:00:05.900000"),
+        _msg("user", "Case and Account", "2024-01-01T10:01:00.400000"),
+        _msg("agent", "Here is the plan", "2024-01-01T10:02:00.100000"),
+    ]
+    merged = _with_archived_messages(archived, history)
+    assert [m["content"] for m in merged] == [
+        "Build a case escalation flow",
+        "Which objects are involved?",
+        "Case and Account",
+        "Here is the plan",
+    ]
+    assert merged[1:] == history
+
+
+def test_repeated_message_outside_the_overlap_is_kept():
+    archived = [_msg("user", "yes", "t1"), _msg("agent", "Anything else?", "t2")]
+    history = [_msg("user", "yes", "t3")]
+    assert _with_archived_messages(archived, history) == [*archived, *history]
@@ -0,0 +1,62 @@
+"""Tests for the chat bubble content sanitizer in app.py."""
+
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("crewai")
+
+from app import _escape_content
+
+
+def test_fenced_code_block_round_trips_unchanged():
+    content = "```apex\nList<Account> accounts = [SELECT Id FROM Account];\nif (a && b) { x = y > 1; }\n```"
+    assert _escape_content(content) == content
+
+
+def test_inline_code_span_round_trips_unchanged():
+    content = "Use `Map<Id, Account>` when `a && b` holds."
+    assert _escape_content(content) == content
+
+
+def test_blockquote_and_ampersand_are_left_for_markdown():
+    content = "> Note: R&D owns this"
+    assert _escape_content(content) == content
+
+
+def test_raw_html_tags_outside_code_are_neutralized():
+    assert _escape_content("hi <script>alert(1)</script>") == "hi &lt;script>alert(1)&lt;/script>"
+
+
+def _render_bubble(content, role="agent"):
+    """Render a chat bubble the way st.markdown does (CommonMark with raw HTML)."""
+    markdown_it = pytest.importorskip("markdown_it")
+    from app import _message_html
+    return markdown_it.MarkdownIt("commonmark", {"html": True}).render(
+        _message_html({"role": role, "content": content})
+    )
+
+
+@pytest.mark.parametrize("role", ["user", "agent"])
+def test_code_span_in_first_paragraph_is_not_live_html(role):
+    rendered = _render_bubble("Use `<lightning-input>` for the field", role)
+    assert "<lightning-input>" not in rendered
+    assert "<code>&lt;lightning-input&gt;</code>" in rendered
+
+
+@pytest.mark.parametrize("role", ["user", "agent"])
+def test_fence_right_after_first_line_is_rendered_as_code(role):
+    rendered = _render_bubble(
+        "Here is the template:\n```html\n<template><img src=x onerror=alert(1)></template>\n```", role
+    )
+    assert "<img" not in rendered
+    assert "&lt;img src=x onerror=alert(1)&gt;" in rendered
+
+
+@pytest.mark.parametrize("content", [
+    "Done:\n```apex\nList<Account> a;\n```",
+    "Unfinished:\n```apex\nList<Account> a;",
+])
+def test_trailing_fence_does_not_swallow_closing_tags(content):
+    rendered = _render_bubble(content)
+    assert rendered.rstrip().endswith("</div></div>")
+    assert "</div></div>" not in rendered.split("<code")[-1].split("</code>")[0]